@@ -1,9 +1,198 @@
 
 
+import binascii
+
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+# Return the data as a str of base64 characters with whitespace
+# removed. Accepts both text and raw bytes.
+def _text(data):
+    if not isinstance(data, str):
+        data = bytes(data).decode("ascii")
+    return "".join(data.split())
+
+
 class Base64():
-    def __init():
-        pass
+    def __init__(self):
+        # Two base64 characters for every 12-bit value, so that a
+        # 3 byte group is encoded with two table lookups.
+        self.enc_table = [ALPHABET[i >> 6] + ALPHABET[i & 0x3f]
+                          for i in range(4096)]
+
+        # The 12-bit value for every pair of base64 characters, and
+        # the 6-bit value for every single character.
+        self.dec_table = dict((pair, i) for (i, pair) in
+                              enumerate(self.enc_table))
+        self.dec_char = dict((ch, i) for (i, ch) in enumerate(ALPHABET))
+
 
     # Convert a hex string s into a base64 encoded string.
-    def h2b64(s):
-        pass
+    def h2b64(self, s):
+        return self.encode(bytearray.fromhex(s))
+
+
+    # Convert a base64 encoded string s into a hex string.
+    def b642h(self, s):
+        return str(binascii.hexlify(self.decode(s)).decode("ascii"))
+
+
+    # Encode the bytes in data into a base64 string with padding.
+    def encode(self, data):
+        encoder = self.encoder()
+        return encoder.update(data) + encoder.final()
+
+
+    # Decode the base64 string s into bytes. Whitespace is ignored.
+    def decode(self, s):
+        decoder = self.decoder()
+        return decoder.update(s) + decoder.final()
+
+
+    # Return an incremental encoder for this codec.
+    def encoder(self):
+        return Base64Encoder(self)
+
+
+    # Return an incremental decoder for this codec.
+    def decoder(self):
+        return Base64Decoder(self)
+
+
+    # Decode the base64 text read from infile and write the bytes to
+    # outfile, chunksize characters at a time. Returns the number of
+    # bytes written.
+    def decode_file(self, infile, outfile, chunksize=65536):
+        decoder = self.decoder()
+        num = 0
+        while True:
+            chunk = infile.read(chunksize)
+            if not chunk:
+                break
+            data = decoder.update(chunk)
+            outfile.write(data)
+            num += len(data)
+        data = decoder.final()
+        outfile.write(data)
+        return num + len(data)
+
+
+    # Encode the bytes read from infile and write the base64 text to
+    # outfile, chunksize bytes at a time. Returns the number of
+    # characters written.
+    def encode_file(self, infile, outfile, chunksize=49152):
+        encoder = self.encoder()
+        num = 0
+        while True:
+            chunk = infile.read(chunksize)
+            if not chunk:
+                break
+            text = encoder.update(chunk)
+            outfile.write(text)
+            num += len(text)
+        text = encoder.final()
+        outfile.write(text)
+        return num + len(text)
+
+
+# Incremental encoder. update() accepts chunks of any size and
+# returns the base64 text for all complete 3 byte groups seen so far.
+# The remaining bytes are kept until the next update() or final().
+class Base64Encoder():
+    def __init__(self, codec):
+        self.table = codec.enc_table
+        self.pending = bytearray()
+
+
+    def update(self, data):
+        data = self.pending + bytearray(data)
+        end = len(data) - len(data) % 3
+        self.pending = data[end:]
+
+        table = self.table
+        out = []
+        for i in range(0, end, 3):
+            val = (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+            out.append(table[val >> 12])
+            out.append(table[val & 0xfff])
+        return "".join(out)
+
+
+    # Return the padded encoding of the remaining bytes.
+    def final(self):
+        data = self.pending
+        self.pending = bytearray()
+        if len(data) == 1:
+            return self.table[data[0] << 4] + "=="
+        if len(data) == 2:
+            val = (data[0] << 10) | (data[1] << 2)
+            return self.table[val >> 6] + ALPHABET[val & 0x3f] + "="
+        return ""
+
+
+# Incremental decoder. update() accepts text chunks of any size,
+# ignores whitespace and returns the bytes for all complete 4
+# character groups seen so far. Padding is only allowed in the last
+# group. Missing padding is accepted by final().
+class Base64Decoder():
+    def __init__(self, codec):
+        self.pairs = codec.dec_table
+        self.chars = codec.dec_char
+        self.pending = ""
+        self.done = False
+
+
+    def update(self, text):
+        text = self.pending + _text(text)
+        if text and self.done:
+            raise ValueError("Data after base64 padding.")
+        end = len(text) - len(text) % 4
+        self.pending = text[end:]
+
+        # A padded group must be the last one.
+        padded = text.find("=", 0, end)
+        if padded >= 0:
+            if padded < end - 2 or text[padded:end] not in ("=", "=="):
+                raise ValueError("Incorrect base64 padding.")
+            if self.pending:
+                raise ValueError("Data after base64 padding.")
+            end -= 4
+
+        pairs = self.pairs
+        out = bytearray()
+        try:
+            for i in range(0, end, 4):
+                val = (pairs[text[i:i + 2]] << 12) | pairs[text[i + 2:i + 4]]
+                out.append(val >> 16)
+                out.append((val >> 8) & 0xff)
+                out.append(val & 0xff)
+            if padded >= 0:
+                out += self.tail(text[end:padded])
+                self.done = True
+        except KeyError:
+            raise ValueError("Invalid base64 character.")
+        return bytes(out)
+
+
+    # Return the bytes for the remaining characters in an unpadded
+    # last group.
+    def final(self):
+        text = self.pending.rstrip("=")
+        self.pending = ""
+        if not text:
+            return bytes(bytearray())
+        try:
+            return bytes(self.tail(text))
+        except KeyError:
+            raise ValueError("Invalid base64 character.")
+
+
+    # Decode a last group of two or three characters.
+    def tail(self, text):
+        if len(text) == 2:
+            return bytearray([self.pairs[text] >> 4])
+        if len(text) == 3:
+            val = (self.pairs[text[:2]] << 6) | self.chars[text[2]]
+            return bytearray([val >> 10, (val >> 2) & 0xff])
+        raise ValueError("Incorrect base64 length.")
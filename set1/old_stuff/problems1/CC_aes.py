@@ -0,0 +1,354 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_aes.py
+# ---------
+# AES block cipher (FIPS-197) in pure Python. The state is kept as
+# four 32 bit column words and every round is done with the T-table
+# method: SubBytes, ShiftRows and MixColumns are combined in four
+# 256 entry tables of words, so a round is 16 table lookups and
+# XORs. Decryption uses the equivalent inverse cipher with its own
+# tables.
+#
+# All tables are computed from the GF(2^8) arithmetic when the
+# module is loaded. Expanded key schedules are kept in a small LRU
+# cache so that repeated calls with the same key skip the key
+# expansion.
+#
+# Keys of 16, 24 and 32 bytes are supported. The problems only use
+# AES-128.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import collections
+import struct
+
+import CC_functions
+
+
+#-------------------------------------------------------------------
+# xtime()
+#
+# Multiply a byte by x, that is 2, in GF(2^8).
+#-------------------------------------------------------------------
+def xtime(a):
+    a <<= 1
+    if a & 0x100:
+        a ^= 0x11b
+    return a
+
+
+#-------------------------------------------------------------------
+# gmul()
+#
+# Multiply two bytes in GF(2^8).
+#-------------------------------------------------------------------
+def gmul(a, b):
+    result = 0
+    while b:
+        if b & 1:
+            result ^= a
+        a = xtime(a)
+        b >>= 1
+    return result
+
+
+#-------------------------------------------------------------------
+# make_sbox()
+#
+# Returns the S-box as a list. Every byte is replaced by its
+# multiplicative inverse followed by the affine transform.
+#-------------------------------------------------------------------
+def make_sbox():
+    exp = [0] * 255
+    log = [0] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x ^= xtime(x)
+
+    sbox = []
+    for a in range(256):
+        if a:
+            b = exp[(255 - log[a]) % 255]
+        else:
+            b = 0
+        s = 0x63
+        for shift in range(5):
+            s ^= ((b << shift) | (b >> (8 - shift))) & 0xff
+        sbox.append(s)
+    return sbox
+
+
+#-------------------------------------------------------------------
+# rotate_tables()
+#
+# Returns the given table of words followed by the tables with
+# every word rotated right by 8, 16 and 24 bits.
+#-------------------------------------------------------------------
+def rotate_tables(table):
+    tables = [table]
+    for i in range(3):
+        tables.append([((w >> 8) | (w << 24)) & 0xffffffff
+                       for w in tables[-1]])
+    return tables
+
+
+sbox = make_sbox()
+inv_sbox = [0] * 256
+for (a, s) in enumerate(sbox):
+    inv_sbox[s] = a
+
+(te0, te1, te2, te3) = rotate_tables(
+    [(gmul(s, 2) << 24) | (s << 16) | (s << 8) | gmul(s, 3) for s in sbox])
+(td0, td1, td2, td3) = rotate_tables(
+    [(gmul(s, 14) << 24) | (gmul(s, 9) << 16) | (gmul(s, 13) << 8) |
+     gmul(s, 11) for s in inv_sbox])
+
+# Byte tables for the last round, shifted into place.
+(se0, se1, se2, se3) = ([s << 24 for s in sbox], [s << 16 for s in sbox],
+                        [s << 8 for s in sbox], sbox)
+(sd0, sd1, sd2, sd3) = ([s << 24 for s in inv_sbox],
+                        [s << 16 for s in inv_sbox],
+                        [s << 8 for s in inv_sbox], inv_sbox)
+
+
+#-------------------------------------------------------------------
+# expand_key()
+#
+# Returns the (number of rounds, encryption round keys, decryption
+# round keys) for a key. The round keys are lists of words, four
+# per round. The decryption round keys are in reverse round order
+# with InvMixColumns applied to the inner rounds, as needed by the
+# equivalent inverse cipher, and with the second and fourth word of
+# every round swapped to match the state layout used by
+# crypt_words().
+#-------------------------------------------------------------------
+def expand_key(key):
+    if len(key) not in (16, 24, 32):
+        raise ValueError("Key must be 16, 24 or 32 bytes, got %d." %
+                         len(key))
+    nk = len(key) / 4
+    rounds = nk + 6
+    words = list(struct.unpack(">%dI" % nk, key))
+    rcon = 1
+    for i in range(nk, 4 * (rounds + 1)):
+        temp = words[i - 1]
+        if i % nk == 0:
+            temp = (se0[(temp >> 16) & 0xff] ^ se1[(temp >> 8) & 0xff] ^
+                    se2[temp & 0xff] ^ se3[temp >> 24] ^ (rcon << 24))
+            rcon = xtime(rcon)
+        elif nk > 6 and i % nk == 4:
+            temp = (se0[temp >> 24] ^ se1[(temp >> 16) & 0xff] ^
+                    se2[(temp >> 8) & 0xff] ^ se3[temp & 0xff])
+        words.append(words[i - nk] ^ temp)
+
+    dec_words = []
+    for r in range(rounds, -1, -1):
+        (w0, w1, w2, w3) = words[4 * r : 4 * r + 4]
+        for w in (w0, w3, w2, w1):
+            if 0 < r < rounds:
+                w = (td0[sbox[w >> 24]] ^ td1[sbox[(w >> 16) & 0xff]] ^
+                     td2[sbox[(w >> 8) & 0xff]] ^ td3[sbox[w & 0xff]])
+            dec_words.append(w)
+    return (rounds, words, dec_words)
+
+
+#-------------------------------------------------------------------
+# Cache of expanded keys, most recently used last.
+#-------------------------------------------------------------------
+cache_size = 64
+key_cache = collections.OrderedDict()
+
+
+#-------------------------------------------------------------------
+# key_schedule()
+#
+# Returns expand_key() for a key using the LRU cache. The least
+# recently used key is dropped when the cache holds cache_size keys.
+# The key can be a str or any object CC_functions.as_bytes() takes.
+#-------------------------------------------------------------------
+def key_schedule(key):
+    key = CC_functions.as_bytes(key)
+    schedule = key_cache.pop(key, None)
+    if schedule is None:
+        schedule = expand_key(key)
+        if len(key_cache) >= cache_size:
+            key_cache.popitem(last=False)
+    key_cache[key] = schedule
+    return schedule
+
+
+#-------------------------------------------------------------------
+# crypt_words()
+#
+# Encrypt or decrypt a list of words, four per block, with the
+# given round keys and tables. Returns the list of result words.
+# The round loop is written out for the four columns so that all
+# state is kept in local variables.
+#
+# Decryption shifts the rows the other way. This is the same as
+# the encryption round with the second and fourth column swapped,
+# so when decrypting the state is kept with those columns swapped
+# and only the input and output words are reordered.
+#-------------------------------------------------------------------
+def crypt_words(words, rounds, rk, tables, final, decrypt):
+    (t0, t1, t2, t3) = tables
+    (f0, f1, f2, f3) = final
+    (k0, k1, k2, k3) = rk[0:4]
+    last = rk[4 * rounds : 4 * rounds + 4]
+    inner = [tuple(rk[r : r + 4]) for r in range(4, 4 * rounds, 4)]
+    result = []
+    append = result.extend
+
+    for i in xrange(0, len(words), 4):
+        s0 = words[i] ^ k0
+        s2 = words[i + 2] ^ k2
+        if decrypt:
+            s1 = words[i + 3] ^ k1
+            s3 = words[i + 1] ^ k3
+        else:
+            s1 = words[i + 1] ^ k1
+            s3 = words[i + 3] ^ k3
+
+        for (r0, r1, r2, r3) in inner:
+            (s0, s1, s2, s3) = (
+                t0[s0 >> 24] ^ t1[(s1 >> 16) & 0xff] ^
+                t2[(s2 >> 8) & 0xff] ^ t3[s3 & 0xff] ^ r0,
+                t0[s1 >> 24] ^ t1[(s2 >> 16) & 0xff] ^
+                t2[(s3 >> 8) & 0xff] ^ t3[s0 & 0xff] ^ r1,
+                t0[s2 >> 24] ^ t1[(s3 >> 16) & 0xff] ^
+                t2[(s0 >> 8) & 0xff] ^ t3[s1 & 0xff] ^ r2,
+                t0[s3 >> 24] ^ t1[(s0 >> 16) & 0xff] ^
+                t2[(s1 >> 8) & 0xff] ^ t3[s2 & 0xff] ^ r3)
+
+        block = [f0[s0 >> 24] ^ f1[(s1 >> 16) & 0xff] ^
+                 f2[(s2 >> 8) & 0xff] ^ f3[s3 & 0xff] ^ last[0],
+                 f0[s1 >> 24] ^ f1[(s2 >> 16) & 0xff] ^
+                 f2[(s3 >> 8) & 0xff] ^ f3[s0 & 0xff] ^ last[1],
+                 f0[s2 >> 24] ^ f1[(s3 >> 16) & 0xff] ^
+                 f2[(s0 >> 8) & 0xff] ^ f3[s1 & 0xff] ^ last[2],
+                 f0[s3 >> 24] ^ f1[(s0 >> 16) & 0xff] ^
+                 f2[(s1 >> 8) & 0xff] ^ f3[s2 & 0xff] ^ last[3]]
+        if decrypt:
+            (block[1], block[3]) = (block[3], block[1])
+        append(block)
+    return result
+
+
+#-------------------------------------------------------------------
+# crypt_blocks()
+#
+# Encrypt or decrypt data, a string or any object supporting the
+# buffer interface such as a memoryview, as a sequence of 16 byte
+# blocks. The data is unpacked to words and processed in pieces of
+# piecesize bytes so that memory use stays bounded for large data.
+#-------------------------------------------------------------------
+def crypt_blocks(key, data, decrypt, piecesize=65536):
+    if len(data) % 16:
+        raise ValueError("Data must be a multiple of 16 bytes, got %d." %
+                         len(data))
+    (rounds, enc_rk, dec_rk) = key_schedule(key)
+    if decrypt:
+        args = (rounds, dec_rk, (td0, td1, td2, td3),
+                (sd0, sd1, sd2, sd3), True)
+    else:
+        args = (rounds, enc_rk, (te0, te1, te2, te3),
+                (se0, se1, se2, se3), False)
+
+    pieces = []
+    for offset in xrange(0, len(data), piecesize):
+        num_words = min(piecesize, len(data) - offset) / 4
+        layout = ">%dI" % num_words
+        words = struct.unpack_from(layout, data, offset)
+        pieces.append(struct.pack(layout, *crypt_words(words, *args)))
+    return "".join(pieces)
+
+
+#-------------------------------------------------------------------
+# encrypt_blocks()
+#
+# Returns data encrypted block by block (ECB) with the key. The
+# length of data must be a multiple of 16 bytes.
+#-------------------------------------------------------------------
+def encrypt_blocks(key, data):
+    return crypt_blocks(key, data, False)
+
+
+#-------------------------------------------------------------------
+# decrypt_blocks()
+#
+# Returns data decrypted block by block (ECB) with the key. The
+# length of data must be a multiple of 16 bytes.
+#-------------------------------------------------------------------
+def decrypt_blocks(key, data):
+    return crypt_blocks(key, data, True)
+
+
+#-------------------------------------------------------------------
+# encrypt_block()
+#
+# Returns a single 16 byte block encrypted with the key.
+#-------------------------------------------------------------------
+def encrypt_block(key, block):
+    if len(block) != 16:
+        raise ValueError("Block must be 16 bytes, got %d." % len(block))
+    return crypt_blocks(key, block, False)
+
+
+#-------------------------------------------------------------------
+# decrypt_block()
+#
+# Returns a single 16 byte block decrypted with the key.
+#-------------------------------------------------------------------
+def decrypt_block(key, block):
+    if len(block) != 16:
+        raise ValueError("Block must be 16 bytes, got %d." % len(block))
+    return crypt_blocks(key, block, True)
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Self test with the FIPS-197 appendix C example vectors.
+#-------------------------------------------------------------------
+def main():
+    plaintext = "00112233445566778899aabbccddeeff".decode('hex')
+    vectors = [("000102030405060708090a0b0c0d0e0f",
+                "69c4e0d86a7b0430d8cdb78070b4c55a"),
+               ("000102030405060708090a0b0c0d0e0f1011121314151617",
+                "dda97ca4864cdfe06eaf70a0ec0d7191"),
+               ("000102030405060708090a0b0c0d0e0f"
+                "101112131415161718191a1b1c1d1e1f",
+                "8ea2b7ca516745bfeafc49904b496089")]
+
+    for (key, expected) in vectors:
+        key = key.decode('hex')
+        ciphertext = encrypt_block(key, plaintext)
+        print "AES-%d: %s" % (len(key) * 8, ciphertext.encode('hex'))
+        if ciphertext.encode('hex') != expected:
+            print "Error: Expected %s" % expected
+        if decrypt_block(key, ciphertext) != plaintext:
+            print "Error: Decrypted block differ from the plaintext."
+        for other in (bytearray(key), memoryview(key), buffer(key)):
+            if encrypt_block(other, plaintext) != ciphertext:
+                print "Error: Key as %s gives another ciphertext." %\
+                      type(other).__name__
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_aes.py
+#=======================================================================
@@ -0,0 +1,251 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_batch.py
+# -----------
+# Batch detection of strings encrypted with single-character XOR
+# over large sets of ciphertexts. The work is spread over a pool of
+# worker processes and only the best matches are kept.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import heapq
+import itertools
+import multiprocessing
+
+import CC_functions
+import CC_metrics
+
+
+#-------------------------------------------------------------------
+# Language used by the worker processes. Set once per worker by
+# init_worker() so that the tables are not sent with every chunk.
+#-------------------------------------------------------------------
+worker_language = None
+
+
+#-------------------------------------------------------------------
+# init_worker()
+#
+# Pool initializer. Stores the language in the worker process.
+#-------------------------------------------------------------------
+def init_worker(language):
+    global worker_language
+    worker_language = language
+
+
+#-------------------------------------------------------------------
+# merge_results()
+#
+# Merge a list of (match, -index, xor_value, ciphertext) results
+# into a min heap holding at most top results. The index is
+# negated so that on equal match the lowest index is kept.
+#-------------------------------------------------------------------
+def merge_results(heap, results, top):
+    for result in results:
+        if len(heap) < top:
+            heapq.heappush(heap, result)
+        elif result > heap[0]:
+            heapq.heapreplace(heap, result)
+
+
+#-------------------------------------------------------------------
+# score_chunk()
+#
+# Find the XOR value for every ciphertext in a chunk of
+# (index, ciphertext) pairs and return the heap with the top best
+# matches in the chunk. Empty ciphertexts can not be matched and
+# are skipped.
+#
+# If collect is set the chunk is scored with a CC_metrics collector
+# and the collected Metrics are returned with the heap, otherwise
+# None is returned in its place.
+#-------------------------------------------------------------------
+def score_chunk(chunk, top, language=None, collect=False):
+    if language is None:
+        language = worker_language
+
+    if collect:
+        with CC_metrics.collect() as metrics:
+            return (score_chunk(chunk, top, language)[0], metrics)
+
+    heap = []
+    for (index, ciphertext) in chunk:
+        if not ciphertext:
+            continue
+        my_db = CC_functions.search_xorval(ciphertext, language)
+        merge_results(heap, [(my_db['match'], -index, my_db['xor_value'],
+                              ciphertext)], top)
+    return (heap, None)
+
+
+#-------------------------------------------------------------------
+# find_xorval()
+#
+# Worker function returning the XOR value for a string using the
+# language of the worker.
+#-------------------------------------------------------------------
+def find_xorval(string):
+    return CC_functions.findxorval(string, worker_language)
+
+
+#-------------------------------------------------------------------
+# findxorvals()
+#
+# Returns the list of XOR values found by findxorval() for every
+# string in a list, in the same order. The strings are spread over
+# jobs worker processes (default one per CPU). With jobs set to 1
+# the strings are processed in the calling process.
+#-------------------------------------------------------------------
+def findxorvals(strings, language, jobs=None):
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if jobs == 1 or len(strings) < 2:
+        return [CC_functions.findxorval(string, language) for string in strings]
+
+    pool = multiprocessing.Pool(jobs, init_worker, (language,))
+    try:
+        chunksize = max(1, len(strings) / (4 * jobs))
+        xor_values = pool.map(find_xorval, strings, chunksize)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return xor_values
+
+
+#-------------------------------------------------------------------
+# chunks()
+#
+# Split an iterable of ciphertexts into lists of
+# (index, ciphertext) pairs with at most size elements.
+#-------------------------------------------------------------------
+def chunks(ciphertexts, size):
+    indexed = enumerate(ciphertexts)
+    while True:
+        chunk = list(itertools.islice(indexed, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+#-------------------------------------------------------------------
+# lookup_chunks()
+#
+# Generates (chunk, top) for the chunks of ciphertexts to score.
+# Without a cache these are the chunks of chunksize ciphertexts and
+# the given top. With a cache the cached results are merged into
+# the heap and only the ciphertexts not in the cache are left in
+# the chunks. The top is then the size of the chunk so that all
+# results are returned to be cached.
+#-------------------------------------------------------------------
+def lookup_chunks(heap, ciphertexts, language, top, chunksize, cache):
+    for chunk in chunks(ciphertexts, chunksize):
+        if cache is None:
+            yield (chunk, top)
+            continue
+
+        misses = []
+        for (index, ciphertext) in chunk:
+            if not ciphertext:
+                continue
+            result = cache.lookup(ciphertext, language)
+            if result is None:
+                misses.append((index, ciphertext))
+            else:
+                (xor_value, match) = result
+                merge_results(heap, [(match, -index, xor_value, ciphertext)],
+                              top)
+        if misses:
+            yield (misses, len(misses))
+
+
+#-------------------------------------------------------------------
+# store_results()
+#
+# Add a list of (match, -index, xor_value, ciphertext) results to
+# the cache, if any.
+#-------------------------------------------------------------------
+def store_results(cache, language, results):
+    if cache is None:
+        return
+    for (match, index, xor_value, ciphertext) in results:
+        cache.store(ciphertext, language, xor_value, match)
+
+
+#-------------------------------------------------------------------
+# detect_single_xor()
+#
+# Given an iterable of ciphertexts and a language returns a list
+# with the top best (match, index, xor_value, ciphertext) results,
+# best match first. The index is the position of the ciphertext
+# in the iterable.
+#
+# The ciphertexts are consumed lazily in chunks of chunksize and
+# scored by jobs worker processes (default one per CPU). At most
+# two chunks per worker are in flight at any time and only the
+# top results of every chunk are returned and merged, so memory
+# use does not grow with the number of ciphertexts.
+#
+# With jobs set to 1 the chunks are scored in the calling process
+# without starting a pool.
+#
+# If a CC_cache.XorCache is given, the cache is checked in the
+# calling process and only the ciphertexts not in it are scored.
+# All their results are returned from the workers and cached.
+#-------------------------------------------------------------------
+def detect_single_xor(ciphertexts, language, top=1, jobs=None,
+                      chunksize=1000, cache=None):
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+
+    heap = []
+    metrics = CC_metrics.collector
+    if jobs == 1:
+        for (chunk, chunk_top) in lookup_chunks(heap, ciphertexts, language,
+                                                top, chunksize, cache):
+            results = score_chunk(chunk, chunk_top, language)[0]
+            store_results(cache, language, results)
+            merge_results(heap, results, top)
+
+    else:
+        collect = metrics is not None
+        pool = multiprocessing.Pool(jobs, init_worker, (language,))
+        try:
+            pending = []
+            for (chunk, chunk_top) in lookup_chunks(heap, ciphertexts,
+                                                    language, top, chunksize,
+                                                    cache):
+                pending.append(pool.apply_async(score_chunk,
+                                                (chunk, chunk_top, None,
+                                                 collect)))
+                while len(pending) >= 2 * jobs:
+                    (results, chunk_metrics) = pending.pop(0).get()
+                    store_results(cache, language, results)
+                    merge_results(heap, results, top)
+                    if collect:
+                        metrics.merge(chunk_metrics)
+
+            for job in pending:
+                (results, chunk_metrics) = job.get()
+                store_results(cache, language, results)
+                merge_results(heap, results, top)
+                if collect:
+                    metrics.merge(chunk_metrics)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    return [(match, -index, xor_value, ciphertext) for
+            (match, index, xor_value, ciphertext) in
+            sorted(heap, reverse=True)]
+
+#=======================================================================
+# EOF CC_batch.py
+#=======================================================================
@@ -0,0 +1,401 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_benchmark.py
+# ---------------
+# Benchmarks for the functions in CC_functions and the problem
+# solutions. Every benchmark is timed over a range of input sizes
+# and reported as operations and MB per second. The results can be
+# written to a JSON file and compared against a stored baseline to
+# find performance regressions.
+#
+# Usage:
+#   CC_benchmark.py [--max-size 1M] [--only name,...]
+#                   [--output results.json]
+#                   [--compare data/benchmark_baseline.json]
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import CC_aes
+import CC_batch
+import CC_cache
+import CC_functions
+import CC_language
+import CC_problem_5_1
+
+
+#-------------------------------------------------------------------
+# Input sizes in bytes, from the 60 byte lines of problem 4 up to
+# 64 MiB.
+#-------------------------------------------------------------------
+sizes = [60, 1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024,
+         64 * 1024 * 1024]
+
+# The pure Python cipher is too slow for the largest sizes.
+aes_sizes = [64, 1024, 64 * 1024, 1024 * 1024]
+
+# N-gram counting is run with these numbers of trigrams, counted
+# with str.count() and with the window histogram, to find where
+# CC_language.window_threshold should be.
+ngram_sizes = [16, 64, 192, 256, 512]
+ngram_input_sizes = [60, 1024, 64 * 1024]
+
+# File to file repeating-key XOR is run with these key lengths.
+file_sizes = [1024 * 1024, 16 * 1024 * 1024]
+xor_key_sizes = [1, 2, 3, 16, 64, 256, 1024, 4096]
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.join(base_dir, "data")
+baseline_file = os.path.join(data_dir, "benchmark_baseline.json")
+
+
+#-------------------------------------------------------------------
+# random_string()
+#
+# Returns a string with size bytes made from a repeated block of
+# 4096 random bytes. The same size always gives the same string.
+#-------------------------------------------------------------------
+def random_string(size):
+    rng = random.Random(size)
+    block = "".join([chr(rng.randrange(256)) for i in range(4096)])
+    return (block * (size / 4096 + 1))[:size]
+
+
+#-------------------------------------------------------------------
+# text_string()
+#
+# Returns size bytes of English text built by repeating the
+# problem descriptions.
+#-------------------------------------------------------------------
+def text_string(size):
+    with open(os.path.join(base_dir, "Problems.txt")) as f:
+        text = f.read()
+    return (text * (size / len(text) + 1))[:size]
+
+
+#-------------------------------------------------------------------
+# Benchmark setup functions. Each one is given an input size and
+# returns a function without arguments to time and the number of
+# input bytes processed by one call.
+#-------------------------------------------------------------------
+def setup_hex2base64(size):
+    hexstring = CC_functions.hexencode(random_string(size))
+    return (lambda: CC_functions.hex2base64(hexstring), size)
+
+
+def setup_hexxor(size):
+    hexstring1 = CC_functions.hexencode(random_string(size))
+    hexstring2 = CC_functions.hexencode(random_string(size))
+    return (lambda: CC_functions.hexxor(hexstring1, hexstring2), size)
+
+
+def setup_hexstring2string(size):
+    hexstring = CC_functions.hexencode(random_string(size))
+    return (lambda: CC_functions.hexstring2string(hexstring), size)
+
+
+def setup_string2val(size):
+    hexstring = CC_functions.hexencode(random_string(size))
+    return (lambda: CC_functions.string2val(hexstring), size)
+
+
+def setup_xorstring(size):
+    string = random_string(size)
+    return (lambda: CC_functions.xorstring(string, "ICE"), size)
+
+
+def setup_xorfile(keysize):
+    def setup(size):
+        (handle, infilename) = tempfile.mkstemp()
+        with os.fdopen(handle, 'wb') as f:
+            f.write(random_string(size))
+        atexit.register(os.remove, infilename)
+        key = random_string(keysize)
+        def xorfile():
+            with open(infilename, 'rb') as infile:
+                with open(os.devnull, 'wb') as outfile:
+                    return CC_problem_5_1.xorfile(infile, outfile, key)
+        return (xorfile, size)
+    return setup
+
+
+def setup_match_string_language(size):
+    string = text_string(size)
+    language = CC_language.english()
+    return (lambda: CC_functions.match_string_language(string, language), size)
+
+
+def setup_ngram_count(num, windowed):
+    def setup(size):
+        string = text_string(size)
+        text = text_string(64 * 1024).lower()
+        trigrams = sorted(set([text[i : i + 3] for i in range(len(text) - 2)]))
+        trigrams = [trigram for trigram in trigrams
+                    if not CC_language.has_border(trigram)]
+        ngrams = random.Random(num).sample(trigrams, num)
+        threshold = CC_language.window_threshold
+        if windowed:
+            CC_language.window_threshold = 0
+        else:
+            CC_language.window_threshold = num + 1
+        try:
+            counter = CC_language.NgramCounter(ngrams)
+        finally:
+            CC_language.window_threshold = threshold
+        return (lambda: counter.count(string), size)
+    return setup
+
+
+def setup_findxorval(size):
+    string = CC_functions.xorstring(text_string(size), chr(0x35))
+    language = CC_language.english()
+    return (lambda: CC_functions.findxorval(string, language), size)
+
+
+def setup_aes_encrypt_blocks(size):
+    data = memoryview(random_string(size))
+    return (lambda: CC_aes.encrypt_blocks("YELLOW SUBMARINE", data), size)
+
+
+def setup_aes_decrypt_blocks(size):
+    data = memoryview(random_string(size))
+    return (lambda: CC_aes.decrypt_blocks("YELLOW SUBMARINE", data), size)
+
+
+def setup_problem_3(size):
+    hexstring = "1b37373331363f78151b7f2b783431333d78397828372d363c78373e783a393b3736"
+    language = CC_language.english()
+    def problem_3():
+        string = CC_functions.hexstring2string(hexstring)
+        xor_value = CC_functions.findxorval(string, language)
+        return CC_functions.xorstring(string, chr(xor_value))
+    return (problem_3, len(hexstring) / 2)
+
+
+def setup_problem_4(size):
+    filename = os.path.join(data_dir, "data_CC_3_1.txt")
+    language = CC_language.english()
+    def problem_4():
+        with open(filename) as f:
+            strings = (CC_functions.hexstring2string(line.strip())
+                       for line in f)
+            return CC_batch.detect_single_xor(strings, language, jobs=1)
+    return (problem_4, os.path.getsize(filename) / 2)
+
+
+def setup_problem_4_cached(size):
+    filename = os.path.join(data_dir, "data_CC_3_1.txt")
+    language = CC_language.english()
+    (handle, cachename) = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    atexit.register(os.remove, cachename)
+    def problem_4():
+        with open(filename) as f:
+            strings = (CC_functions.hexstring2string(line.strip())
+                       for line in f)
+            with CC_cache.XorCache(cachename) as cache:
+                return CC_batch.detect_single_xor(strings, language, jobs=1,
+                                                  cache=cache)
+    problem_4()
+    return (problem_4, os.path.getsize(filename) / 2)
+
+
+#-------------------------------------------------------------------
+# The benchmarks as (name, setup function, sizes) tuples. The end
+# to end problem flows have a fixed input and a size of None.
+#-------------------------------------------------------------------
+benchmarks = [("hex2base64", setup_hex2base64, sizes),
+              ("hexxor", setup_hexxor, sizes),
+              ("hexstring2string", setup_hexstring2string, sizes),
+              ("string2val", setup_string2val, sizes),
+              ("xorstring", setup_xorstring, sizes),
+              ("match_string_language", setup_match_string_language, sizes),
+              ("findxorval", setup_findxorval, sizes),
+              ("aes_encrypt_blocks", setup_aes_encrypt_blocks, aes_sizes),
+              ("aes_decrypt_blocks", setup_aes_decrypt_blocks, aes_sizes),
+              ("problem_3", setup_problem_3, [None]),
+              ("problem_4", setup_problem_4, [None]),
+              ("problem_4_cached", setup_problem_4_cached, [None])] +\
+             [("xorfile_key%d" % keysize, setup_xorfile(keysize), file_sizes)
+              for keysize in xor_key_sizes] +\
+             [("ngram_%s_%d" % (method, num),
+               setup_ngram_count(num, method == 'windows'), ngram_input_sizes)
+              for num in ngram_sizes for method in ('count', 'windows')]
+
+
+#-------------------------------------------------------------------
+# measure()
+#
+# Returns the best time in seconds for one call of the function.
+# Fast functions are called in batches large enough to be timed
+# reliably and the best of repeat batches is used.
+#-------------------------------------------------------------------
+def measure(function, repeat=3, min_time=0.05):
+    number = 1
+    while True:
+        start = time.time()
+        for i in xrange(number):
+            function()
+        elapsed = time.time() - start
+        if elapsed >= min_time or number >= 1000000:
+            break
+        number *= 10
+
+    best = elapsed
+    if elapsed < 1.0:
+        for i in range(repeat - 1):
+            start = time.time()
+            for j in xrange(number):
+                function()
+            best = min(best, time.time() - start)
+    return best / number
+
+
+#-------------------------------------------------------------------
+# run_benchmarks()
+#
+# Run the benchmarks and return a list of result dictionaries.
+# Sizes above max_size are skipped and if only is given, only the
+# benchmarks with names in it are run. Every result is printed
+# when it is ready.
+#-------------------------------------------------------------------
+def run_benchmarks(max_size=None, only=None, out=sys.stdout):
+    results = []
+    for (name, setup, bench_sizes) in benchmarks:
+        if only and name not in only:
+            continue
+        for size in bench_sizes:
+            if size is not None and max_size is not None and size > max_size:
+                continue
+            (function, num_bytes) = setup(size)
+            seconds = measure(function)
+            result = {'name': name, 'size': size, 'bytes': num_bytes,
+                      'seconds': seconds, 'ops_per_s': 1.0 / seconds,
+                      'mb_per_s': num_bytes / seconds / 1e6}
+            results.append(result)
+            out.write(format_result(result) + "\n")
+            out.flush()
+    return results
+
+
+#-------------------------------------------------------------------
+# format_result()
+#
+# Returns a result as one line of text.
+#-------------------------------------------------------------------
+def format_result(result):
+    size = result['size']
+    if size is None:
+        size = "-"
+    return "%-24s %10s %14.3f ops/s %10.3f MB/s" %\
+           (result['name'], size, result['ops_per_s'], result['mb_per_s'])
+
+
+#-------------------------------------------------------------------
+# compare()
+#
+# Compare results against baseline results. Returns a list of
+# (result, baseline result, ratio) for every benchmark that is
+# more than tolerance slower than the baseline. Benchmarks that
+# are not in both sets of results are ignored.
+#-------------------------------------------------------------------
+def compare(results, baseline, tolerance=0.2):
+    reference = dict([((result['name'], result['size']), result)
+                      for result in baseline])
+    regressions = []
+    for result in results:
+        key = (result['name'], result['size'])
+        if key not in reference:
+            continue
+        ratio = result['mb_per_s'] / reference[key]['mb_per_s']
+        if ratio < (1.0 - tolerance):
+            regressions.append((result, reference[key], ratio))
+    return regressions
+
+
+#-------------------------------------------------------------------
+# parse_size()
+#
+# Parse a size given as bytes with an optional K, M or G suffix.
+#-------------------------------------------------------------------
+def parse_size(text):
+    units = {'K': 1024, 'M': 1024 * 1024, 'G': 1024 * 1024 * 1024}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(text[:-1]) * units[text[-1]]
+    return int(text)
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Run the benchmarks given on the command line.
+#-------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CC functions.")
+    parser.add_argument("--max-size", type=parse_size, default=None,
+                        help="Skip input sizes above this, e.g. 1M.")
+    parser.add_argument("--only", default=None,
+                        help="Comma separated benchmark names to run.")
+    parser.add_argument("--output", default=None,
+                        help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", nargs="?", const=baseline_file,
+                        default=None,
+                        help="Compare against a baseline JSON file.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown before flagging, default 0.2.")
+    args = parser.parse_args()
+
+    only = None
+    if args.only:
+        only = args.only.split(",")
+
+    results = run_benchmarks(args.max_size, only)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'results': results}, f, indent=1, sort_keys=True)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        print ""
+        if not regressions:
+            print "No regressions against %s." % args.compare
+        for (result, reference, ratio) in regressions:
+            print "Regression: %s size %s at %.2f of baseline (%.3f vs %.3f MB/s)" %\
+                  (result['name'], result['size'], ratio,
+                   result['mb_per_s'], reference['mb_per_s'])
+        if regressions:
+            sys.exit(1)
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_benchmark.py
+#=======================================================================
@@ -0,0 +1,241 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_cache.py
+# -----------
+# Cache of key search results so that ciphertexts already searched
+# are not searched again. The cache has two tiers, an LRU cache in
+# memory and an optional sqlite3 database on disk, both bounded in
+# size.
+#
+# Entries are keyed by a hash of the language fingerprint and the
+# ciphertext. The fingerprint is a hash of the language tables and
+# the cache version, so results for a changed language or a changed
+# scoring are never returned. They are evicted from the database
+# as it fills up.
+#
+# Usage:
+#   with CC_cache.XorCache("xorvals.db") as cache:
+#       CC_functions.findxorval(string, language, cache)
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import collections
+import hashlib
+import sqlite3
+
+import CC_functions
+import CC_language
+
+
+#-------------------------------------------------------------------
+# Cache version. Change it when the scoring or key search is
+# changed in a way that gives other results.
+#-------------------------------------------------------------------
+version = 1
+
+
+#-------------------------------------------------------------------
+# language_fingerprint()
+#
+# Returns a hash of the language tables. A LanguageModel is hashed
+# in its binary form, a language tuple in a canonical text form.
+#-------------------------------------------------------------------
+def language_fingerprint(language):
+    if isinstance(language, CC_language.LanguageModel):
+        data = language.tostring()
+    else:
+        (alphabet, bigrams, trigrams) = language
+        data = repr((sorted(alphabet.items()), list(bigrams), list(trigrams)))
+    return hashlib.sha1("CC_cache %d\n" % version + data).digest()
+
+
+#-------------------------------------------------------------------
+# XorCache
+#
+# Two tier cache of (xor_value, match) results. memory_size is the
+# number of entries kept in memory. If filename is given, entries
+# are also stored in a sqlite3 database holding at most disk_size
+# entries, evicting the least recently used ones. Writes to the
+# database are batched and done on flush() and close().
+#
+# Language models are expected not to change after they are
+# created, so their fingerprints are computed once. Language tuples
+# are fingerprinted on every call.
+#-------------------------------------------------------------------
+class XorCache(object):
+    def __init__(self, filename=None, memory_size=65536, disk_size=1000000,
+                 batch_size=1000):
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.batch_size = batch_size
+        self.memory = collections.OrderedDict()
+        self.fingerprints = {}
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+        self.db = None
+        if filename is not None:
+            self.db = sqlite3.connect(filename)
+            self.db.execute("CREATE TABLE IF NOT EXISTS xorvals "
+                            "(key BLOB PRIMARY KEY, xor_value INTEGER, "
+                            "match REAL, used INTEGER)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS xorvals_used "
+                            "ON xorvals (used)")
+            self.clock = self.db.execute(
+                "SELECT MAX(used) FROM xorvals").fetchone()[0] or 0
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    #---------------------------------------------------------------
+    # key()
+    #
+    # Returns the cache key for a ciphertext and language.
+    #---------------------------------------------------------------
+    def key(self, ciphertext, language):
+        if isinstance(language, CC_language.LanguageModel):
+            entry = self.fingerprints.get(id(language))
+            if entry is None:
+                entry = (language, language_fingerprint(language))
+                self.fingerprints[id(language)] = entry
+            fingerprint = entry[1]
+        else:
+            fingerprint = language_fingerprint(language)
+        return hashlib.sha1(fingerprint + ciphertext).digest()
+
+
+    #---------------------------------------------------------------
+    # lookup()
+    #
+    # Returns the cached (xor_value, match) for a ciphertext and
+    # language, or None if it is not in the cache.
+    #---------------------------------------------------------------
+    def lookup(self, ciphertext, language):
+        key = self.key(CC_functions.as_bytes(ciphertext), language)
+        result = self.memory.pop(key, None)
+        if result is None and self.db is not None:
+            result = self.pending.get(key)
+            if result is None:
+                row = self.db.execute("SELECT xor_value, match FROM xorvals "
+                                      "WHERE key = ?",
+                                      (buffer(key),)).fetchone()
+                if row is not None:
+                    result = (row[0], row[1])
+                    self.write(key, result)
+
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.remember(key, result)
+        return result
+
+
+    #---------------------------------------------------------------
+    # store()
+    #
+    # Add the result of a key search to the cache.
+    #---------------------------------------------------------------
+    def store(self, ciphertext, language, xor_value, match):
+        key = self.key(CC_functions.as_bytes(ciphertext), language)
+        result = (xor_value, match)
+        self.memory.pop(key, None)
+        self.remember(key, result)
+        if self.db is not None:
+            self.write(key, result)
+
+
+    #---------------------------------------------------------------
+    # search()
+    #
+    # Returns the (xor_value, match) for a ciphertext from the cache
+    # or from CC_functions.search_xorval(), which is then cached.
+    #---------------------------------------------------------------
+    def search(self, ciphertext, language):
+        result = self.lookup(ciphertext, language)
+        if result is None:
+            my_db = CC_functions.search_xorval(ciphertext, language)
+            result = (my_db['xor_value'], my_db['match'])
+            self.store(ciphertext, language, *result)
+        return result
+
+
+    #---------------------------------------------------------------
+    # remember()
+    #
+    # Add an entry last in the memory LRU, dropping the least
+    # recently used entry if it is full.
+    #---------------------------------------------------------------
+    def remember(self, key, result):
+        if self.memory_size < 1:
+            return
+        if len(self.memory) >= self.memory_size:
+            self.memory.popitem(last=False)
+        self.memory[key] = result
+
+
+    #---------------------------------------------------------------
+    # write()
+    #
+    # Queue an entry to be written to the database. Entries read
+    # from the database are written back to update their use.
+    #---------------------------------------------------------------
+    def write(self, key, result):
+        self.pending[key] = result
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+
+    #---------------------------------------------------------------
+    # flush()
+    #
+    # Write the queued entries to the database and evict the least
+    # recently used entries above disk_size.
+    #---------------------------------------------------------------
+    def flush(self):
+        if self.db is None or not self.pending:
+            return
+        rows = []
+        for (key, (xor_value, match)) in self.pending.items():
+            self.clock += 1
+            rows.append((buffer(key), xor_value, match, self.clock))
+        self.pending = {}
+
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO xorvals "
+                                "(key, xor_value, match, used) "
+                                "VALUES (?, ?, ?, ?)", rows)
+            count = self.db.execute("SELECT COUNT(*) FROM xorvals").fetchone()[0]
+            if count > self.disk_size:
+                self.db.execute("DELETE FROM xorvals WHERE used IN "
+                                "(SELECT used FROM xorvals ORDER BY used "
+                                "LIMIT ?)", (count - self.disk_size,))
+
+
+    #---------------------------------------------------------------
+    # close()
+    #
+    # Flush and close the database.
+    #---------------------------------------------------------------
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
+
+#=======================================================================
+# EOF CC_cache.py
+#=======================================================================
@@ -0,0 +1,410 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_cli.py
+# ---------
+# Command line interface to the problem solutions for use in
+# pipelines. Input is read line by line from the given files or
+# from stdin and results are written to stdout as soon as they are
+# ready, as text or as one JSON object per line.
+#
+# Usage:
+#   CC_cli.py hex2b64 [files]
+#   CC_cli.py b64dec [--hex] [files]
+#   CC_cli.py xor (--key KEY | --key-hex HEX) [--hex] [files]
+#   CC_cli.py detect-single-xor [--top N] [--model FILE] [files]
+#   CC_cli.py break-repeating-xor [--input base64|hex|raw] [--model FILE]
+#                                 [files]
+#   CC_cli.py detect-ecb [files]
+#
+# Without arguments the self test is run.
+#
+# All commands take --format text|jsonl and the detection and
+# breaking commands take --jobs N for the number of worker
+# processes (default one per CPU). They score text with the English
+# statistics, or a model file made by CC_train.py given with
+# --model. Lines are numbered from 0. The
+# CC modules are imported by the commands that use them, so that
+# a command only loads what it needs and starts fast.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import argparse
+import binascii
+import errno
+import fileinput
+import json
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+
+
+#-------------------------------------------------------------------
+# emit()
+#
+# Write one result to stdout, as the text line or as a JSON object
+# on one line, and flush it so that it reaches the next program in
+# the pipeline directly.
+#-------------------------------------------------------------------
+def emit(args, text, record):
+    if args.format == 'jsonl':
+        sys.stdout.write(json.dumps(record, sort_keys=True) + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    sys.stdout.flush()
+
+
+#-------------------------------------------------------------------
+# as_text()
+#
+# Returns bytes as a unicode string for JSON output. Every byte is
+# mapped to the code point with the same value (Latin-1), so any
+# byte string can be represented and recovered.
+#-------------------------------------------------------------------
+def as_text(data):
+    return data.decode('latin-1')
+
+
+#-------------------------------------------------------------------
+# input_lines()
+#
+# Returns an iterator over the lines of the input files, or stdin
+# if no files are given or a file is '-'.
+#-------------------------------------------------------------------
+def input_lines(args):
+    return fileinput.FileInput(args.files or ['-'])
+
+
+#-------------------------------------------------------------------
+# input_chunks()
+#
+# Generates the raw bytes of the input files, or stdin, in chunks
+# of chunksize bytes.
+#-------------------------------------------------------------------
+def input_chunks(args, chunksize=65536):
+    for filename in args.files or ['-']:
+        if filename == '-':
+            infile = sys.stdin
+        else:
+            infile = open(filename, 'rb')
+        try:
+            for chunk in iter(lambda: infile.read(chunksize), ""):
+                yield chunk
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+
+
+#-------------------------------------------------------------------
+# language()
+#
+# Returns the language model given with --model, or English.
+#-------------------------------------------------------------------
+def language(args):
+    import CC_language
+
+    if args.model:
+        return CC_language.load(args.model)
+    return CC_language.english()
+
+
+#-------------------------------------------------------------------
+# hex2b64
+#
+# Base64 encode every line of hexadecimal values.
+#-------------------------------------------------------------------
+def cmd_hex2b64(args):
+    import CC_functions
+
+    for (index, line) in enumerate(input_lines(args)):
+        encoded = CC_functions.hex2base64(line)
+        emit(args, encoded, {'line': index, 'base64': encoded})
+
+
+#-------------------------------------------------------------------
+# b64dec
+#
+# Decode Base64 text. Line breaks and other whitespace are ignored
+# and the decoded bytes are written as they become available, raw
+# or as hexadecimal lines with --hex. With jsonl output every
+# decoded piece is a record with its offset.
+#-------------------------------------------------------------------
+def cmd_b64dec(args):
+    import binascii
+    import CC_functions
+
+    pending = ""
+    offset = 0
+    for line in input_lines(args):
+        pending += "".join(line.split())
+        usable = len(pending) - len(pending) % 4
+        if not usable:
+            continue
+        decoded = binascii.a2b_base64(pending[:usable])
+        pending = pending[usable:]
+        if args.format == 'jsonl':
+            emit(args, None, {'offset': offset,
+                              'hex': CC_functions.hexencode(decoded)})
+        elif args.hex:
+            emit(args, CC_functions.hexencode(decoded), None)
+        else:
+            sys.stdout.write(decoded)
+            sys.stdout.flush()
+        offset += len(decoded)
+
+    if pending:
+        raise ValueError("Base64 input is not a multiple of 4 characters.")
+
+
+#-------------------------------------------------------------------
+# xor
+#
+# XOR the input with a repeating key. Raw input is XORed as one
+# stream. With --hex every line is hexadecimal values XORed with
+# the key from its start and written as a hexadecimal line.
+#-------------------------------------------------------------------
+def cmd_xor(args):
+    import CC_functions
+
+    if args.key_hex is not None:
+        key = CC_functions.hexdecode(args.key_hex)
+    else:
+        key = args.key
+    if not key:
+        raise ValueError("XOR key must not be empty.")
+
+    if not args.hex:
+        for chunk in CC_functions.xorchunks(input_chunks(args), key):
+            sys.stdout.write(chunk)
+        sys.stdout.flush()
+        return
+
+    for (index, line) in enumerate(input_lines(args)):
+        xored = CC_functions.hexencode(
+            CC_functions.xorstring(CC_functions.hexdecode(line.strip()), key))
+        emit(args, xored, {'line': index, 'hex': xored})
+
+
+#-------------------------------------------------------------------
+# detect-single-xor
+#
+# Find the lines of hexadecimal values most probably encrypted with
+# single byte XOR and print them decrypted, best match first.
+#-------------------------------------------------------------------
+def cmd_detect_single_xor(args):
+    import CC_batch
+    import CC_functions
+
+    ciphertexts = (CC_functions.hexdecode(line.strip())
+                   for line in input_lines(args))
+    results = CC_batch.detect_single_xor(ciphertexts, language(args),
+                                         args.top, args.jobs)
+    for (match, index, xor_value, ciphertext) in results:
+        plaintext = CC_functions.xorstring(ciphertext, chr(xor_value))
+        emit(args, "%d 0x%02x %f %r" % (index, xor_value, match, plaintext),
+             {'line': index, 'xor_value': xor_value, 'match': match,
+              'plaintext': as_text(plaintext)})
+
+
+#-------------------------------------------------------------------
+# break-repeating-xor
+#
+# Find the key of a ciphertext encrypted with repeating key XOR and
+# print the key and the plaintext. The whole input is one
+# ciphertext in Base64 (default), hexadecimal or raw form.
+#-------------------------------------------------------------------
+def cmd_break_repeating_xor(args):
+    import CC_functions
+    import CC_problem_6_1
+
+    if args.input == 'raw':
+        ciphertext = "".join(input_chunks(args))
+    else:
+        text = "".join(["".join(line.split()) for line in input_lines(args)])
+        if args.input == 'hex':
+            ciphertext = CC_functions.hexdecode(text)
+        else:
+            ciphertext = text.decode('base64')
+
+    (key, plaintext) = CC_problem_6_1.break_repeating_xor(
+        ciphertext, language(args), jobs=args.jobs)
+    if args.format == 'jsonl':
+        emit(args, None, {'key': as_text(key),
+                          'key_hex': CC_functions.hexencode(key),
+                          'plaintext': as_text(plaintext)})
+    else:
+        emit(args, "Key: %r" % key, None)
+        emit(args, plaintext, None)
+
+
+#-------------------------------------------------------------------
+# detect-ecb
+#
+# Print every line of hexadecimal values with repeated blocks, as
+# soon as it has been scanned, with the number of repetitions.
+#-------------------------------------------------------------------
+def cmd_detect_ecb(args):
+    import CC_ecb
+
+    for (index, count) in CC_ecb.scan(input_lines(args), True,
+                                      args.blocksize, args.jobs):
+        if count:
+            emit(args, "%d %d" % (index, count),
+                 {'line': index, 'repetitions': count})
+
+
+#-------------------------------------------------------------------
+# parse_args()
+#
+# Returns the parsed command line.
+#-------------------------------------------------------------------
+def parse_args(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--format", choices=['text', 'jsonl'], default='text',
+                        help="Output format, default text.")
+    common.add_argument("files", nargs="*",
+                        help="Input files, default stdin.")
+    jobs = argparse.ArgumentParser(add_help=False)
+    jobs.add_argument("--jobs", type=int, default=None,
+                      help="Number of worker processes, default one per CPU.")
+    model = argparse.ArgumentParser(add_help=False)
+    model.add_argument("--model", default=None,
+                       help="Language model file from CC_train.py, "
+                       "default English.")
+
+    parser = argparse.ArgumentParser(
+        description="Matasano Crypto Challenges tools.")
+    commands = parser.add_subparsers(dest="command")
+
+    command = commands.add_parser("hex2b64", parents=[common],
+                                  help="Base64 encode lines of hex values.")
+    command.set_defaults(function=cmd_hex2b64)
+
+    command = commands.add_parser("b64dec", parents=[common],
+                                  help="Decode Base64 text.")
+    command.add_argument("--hex", action="store_true",
+                         help="Write hexadecimal lines instead of raw bytes.")
+    command.set_defaults(function=cmd_b64dec)
+
+    command = commands.add_parser("xor", parents=[common],
+                                  help="XOR with a repeating key.")
+    key = command.add_mutually_exclusive_group(required=True)
+    key.add_argument("--key", help="The key as text.")
+    key.add_argument("--key-hex", help="The key as hexadecimal values.")
+    command.add_argument("--hex", action="store_true",
+                         help="Input and output are lines of hex values.")
+    command.set_defaults(function=cmd_xor)
+
+    command = commands.add_parser("detect-single-xor",
+                                  parents=[common, jobs, model],
+                                  help="Find lines encrypted with single "
+                                  "byte XOR.")
+    command.add_argument("--top", type=int, default=1,
+                         help="Number of lines to print, default 1.")
+    command.set_defaults(function=cmd_detect_single_xor)
+
+    command = commands.add_parser("break-repeating-xor",
+                                  parents=[common, jobs, model],
+                                  help="Break repeating key XOR.")
+    command.add_argument("--input", choices=['base64', 'hex', 'raw'],
+                         default='base64',
+                         help="Input encoding, default base64.")
+    command.set_defaults(function=cmd_break_repeating_xor)
+
+    command = commands.add_parser("detect-ecb", parents=[common, jobs],
+                                  help="Find lines of hex values with "
+                                  "repeated blocks.")
+    command.add_argument("--blocksize", type=int, default=16,
+                         help="Block size in bytes, default 16.")
+    command.set_defaults(function=cmd_detect_ecb)
+
+    return parser.parse_args(argv)
+
+
+#-------------------------------------------------------------------
+# self_test()
+#
+# Run commands on inputs they must reject and check that each one
+# ends with an error message and status 1, not a traceback.
+# Returns the number of failed cases.
+#-------------------------------------------------------------------
+def self_test():
+    cases = [("b64dec, bad padding", ["b64dec"], "QQ=A\n"),
+             ("b64dec, odd length", ["b64dec"], "QUJD QQ\n"),
+             ("break-repeating-xor, bad padding",
+              ["break-repeating-xor", "--jobs", "1"], "QQ=\n"),
+             ("hex2b64, invalid digit", ["hex2b64"], "0g\n")]
+
+    failed = 0
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for (description, argv, data) in cases:
+            filename = os.path.join(tmpdir, "input.txt")
+            with open(filename, 'wb') as f:
+                f.write(data)
+            (stdout, stderr) = (sys.stdout, sys.stderr)
+            sys.stdout = StringIO.StringIO()
+            sys.stderr = StringIO.StringIO()
+            status = 0
+            try:
+                main(argv + [filename])
+            except SystemExit as e:
+                status = e.code
+            except Exception as e:
+                status = e
+            finally:
+                message = sys.stderr.getvalue()
+                (sys.stdout, sys.stderr) = (stdout, stderr)
+            if status == 1 and message.startswith(argv[0] + ": error:"):
+                print "Rejected %s: %s" % (description, message.strip())
+            else:
+                print "Error: %s not rejected, got %r." % (description, status)
+                failed += 1
+    finally:
+        shutil.rmtree(tmpdir)
+    return failed
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Run the command given on the command line, or the self test
+# without arguments. Invalid input is reported on stderr. A closed
+# stdout, for example when piped to head, ends the command quietly.
+#-------------------------------------------------------------------
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        if self_test():
+            sys.exit(1)
+        return
+
+    args = parse_args(argv)
+    try:
+        args.function(args)
+    except IOError as e:
+        if e.errno != errno.EPIPE:
+            raise
+    except (ValueError, AssertionError, binascii.Error) as e:
+        sys.stderr.write("%s: error: %s\n" % (args.command, e))
+        sys.exit(1)
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_cli.py
+#=======================================================================
@@ -0,0 +1,292 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_corpus.py
+# ------------
+# Reader for large files with one ciphertext per line, such as the
+# hex encoded lines of problems 4 and 8. The file is memory mapped
+# and an index with the offset of every line is built in one pass.
+# Lines are only decoded when they are asked for, so a corpus of
+# any size is scanned with constant memory.
+#
+# The index is saved next to the file as <file>.idx and reused when
+# the file is opened again as long as its size and modification
+# time are unchanged. Since any line is found from the index,
+# workers can be given ranges of lines and open the corpus
+# themselves instead of being sent the ciphertexts.
+#
+# Usage:
+#   with CC_corpus.Corpus("data/data_CC_3_1.txt") as corpus:
+#       for ciphertext in corpus:
+#           ...
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import array
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+import CC_functions
+
+
+#-------------------------------------------------------------------
+# Offsets are stored as unsigned longs, 64 bits on the platforms we
+# run on. Python 2 arrays have no 64 bit type code of their own.
+#-------------------------------------------------------------------
+offset_typecode = 'L'
+
+
+#-------------------------------------------------------------------
+# Corpus
+#
+# A file of ciphertexts, one per line. corpus[i] is line i decoded
+# with decode (default hexadecimal) after surrounding whitespace is
+# stripped. Empty lines are kept as empty ciphertexts so that the
+# index matches the line number.
+#
+# If index is True the index is loaded from and saved to the index
+# file, which is skipped silently if it can not be written.
+#-------------------------------------------------------------------
+class Corpus(object):
+    magic = "CCIX"
+    version = 1
+    header = struct.Struct("<4sBBHQd")
+
+    def __init__(self, filename, decode=CC_functions.hexdecode, index=True):
+        self.filename = filename
+        self.index_filename = filename + ".idx"
+        self.decode = decode
+        self.file = open(filename, 'rb')
+        stat = os.fstat(self.file.fileno())
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        if self.size:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = ""
+
+        self.offsets = None
+        if index:
+            self.offsets = self.load_index()
+        if self.offsets is None:
+            self.offsets = self.build_index()
+            if index:
+                self.save_index()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+    def __getitem__(self, index):
+        return self.decode(self.line(index))
+
+
+    def __iter__(self):
+        return self.ciphertexts()
+
+
+    #---------------------------------------------------------------
+    # line()
+    #
+    # Returns line index stripped of surrounding whitespace.
+    #---------------------------------------------------------------
+    def line(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("Line %d outside the corpus." % index)
+        return self.data[self.offsets[index] : self.offsets[index + 1]].strip()
+
+
+    #---------------------------------------------------------------
+    # ciphertexts()
+    #
+    # Generates the decoded ciphertexts of lines start to stop.
+    #---------------------------------------------------------------
+    def ciphertexts(self, start=0, stop=None):
+        if stop is None:
+            stop = len(self)
+        for index in xrange(start, stop):
+            yield self.decode(self.line(index))
+
+
+    #---------------------------------------------------------------
+    # shards()
+    #
+    # Returns a list of at most num (start, stop) line ranges with
+    # about the same number of bytes in each, for spreading the
+    # corpus over workers.
+    #---------------------------------------------------------------
+    def shards(self, num):
+        ranges = []
+        start = 0
+        for shard in range(1, num + 1):
+            target = self.size * shard // num
+            # Binary search for the first line starting at or after
+            # the target offset.
+            (low, high) = (start, len(self))
+            while low < high:
+                middle = (low + high) // 2
+                if self.offsets[middle] < target:
+                    low = middle + 1
+                else:
+                    high = middle
+            stop = low
+            if shard == num:
+                stop = len(self)
+            if stop > start:
+                ranges.append((start, stop))
+                start = stop
+        return ranges
+
+
+    #---------------------------------------------------------------
+    # build_index()
+    #
+    # Returns the array with the start offset of every line and the
+    # end of the file. A last line without a line break is a line.
+    #---------------------------------------------------------------
+    def build_index(self):
+        offsets = array.array(offset_typecode, [0])
+        find = self.data.find
+        pos = find("\n")
+        while pos >= 0:
+            offsets.append(pos + 1)
+            pos = find("\n", pos + 1)
+        if offsets[-1] != self.size:
+            offsets.append(self.size)
+        return offsets
+
+
+    #---------------------------------------------------------------
+    # load_index()
+    #
+    # Returns the saved index, or None if there is no index file or
+    # it was saved for another version of the file.
+    #---------------------------------------------------------------
+    def load_index(self):
+        try:
+            with open(self.index_filename, 'rb') as f:
+                data = f.read()
+        except IOError:
+            return None
+
+        if len(data) < self.header.size:
+            return None
+        (magic, version, itemsize, reserved, size, mtime) =\
+            self.header.unpack_from(data)
+        offsets = array.array(offset_typecode)
+        if (magic != self.magic or version != self.version or
+            itemsize != offsets.itemsize or size != self.size or
+            mtime != self.mtime or (len(data) - self.header.size) % itemsize):
+            return None
+        offsets.fromstring(data[self.header.size :])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        if not offsets or offsets[0] != 0 or offsets[-1] != self.size:
+            return None
+        return offsets
+
+
+    #---------------------------------------------------------------
+    # save_index()
+    #
+    # Write the index to the index file. The file is written under
+    # a temporary name and renamed, so a reader never sees a partly
+    # written index.
+    #---------------------------------------------------------------
+    def save_index(self):
+        offsets = self.offsets
+        if sys.byteorder == 'big':
+            offsets = array.array(offset_typecode, offsets)
+            offsets.byteswap()
+        temporary = "%s.%d.tmp" % (self.index_filename, os.getpid())
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(self.header.pack(self.magic, self.version,
+                                         offsets.itemsize, 0, self.size,
+                                         self.mtime))
+                f.write(offsets.tostring())
+            os.rename(temporary, self.index_filename)
+        except (IOError, OSError):
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+
+    #---------------------------------------------------------------
+    # close()
+    #
+    # Unmap and close the file.
+    #---------------------------------------------------------------
+    def close(self):
+        if self.size:
+            self.data.close()
+        self.file.close()
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Self test. Indexes a generated file of hexadecimal lines, checks
+# every line against the file and reopens it from the saved index.
+#-------------------------------------------------------------------
+def main():
+    rng = random.Random(20)
+    lines = [CC_functions.hexencode("".join([chr(rng.randrange(256))
+                                             for i in range(30)]))
+             for j in range(100000)]
+    lines[17] = ""
+    (handle, filename) = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(handle, 'w') as f:
+        f.write("\n".join(lines))
+
+    try:
+        start = time.time()
+        with Corpus(filename) as corpus:
+            built = time.time() - start
+            assert len(corpus) == len(lines), "Wrong number of lines."
+            for (line, ciphertext) in zip(lines, corpus):
+                assert ciphertext == CC_functions.hexdecode(line), "Line differ."
+            print "Indexed %d lines in %.3f seconds." % (len(corpus), built)
+            print "Shards: %s" % corpus.shards(4)
+
+        start = time.time()
+        with Corpus(filename) as corpus:
+            print "Reopened from the index in %.3f seconds." %\
+                  (time.time() - start)
+            assert corpus[-1] == CC_functions.hexdecode(lines[-1]), "Last line."
+    finally:
+        os.remove(filename)
+        if os.path.exists(filename + ".idx"):
+            os.remove(filename + ".idx")
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_corpus.py
+#=======================================================================
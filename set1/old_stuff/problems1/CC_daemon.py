@@ -0,0 +1,594 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_daemon.py
+# ------------
+# Long running scoring server on a Unix domain socket, and a thin
+# client for it. The server keeps the English language model, the
+# key search cache and a pool of worker processes warm, so that a
+# request does not pay for interpreter startup and table building.
+#
+# The protocol is one JSON object per line in both directions. A
+# request has an id chosen by the client, an op and the ciphertext
+# as 'hex' or 'base64':
+#
+#   {"id": 1, "op": "single-xor", "hex": "1b37373331363f78..."}
+#
+# The ops are 'single-xor' (single byte key search), 'repeating-xor'
+# (break repeating key XOR) and 'ecb' (count repeated blocks). The
+# reply has the same id and op and either the result or an 'error'.
+# Requests on a connection can be pipelined and the replies are
+# written as they finish, so they may come in another order.
+#
+# Requests from all connections are queued to one dispatcher
+# thread. While the workers are busy the queue fills up, and it is
+# sent to the pool as batches of at most batch_size requests when
+# a worker is free. An idle server therefore answers a single
+# request directly and a loaded server batches.
+#
+# Usage:
+#   CC_daemon.py serve [--socket PATH] [--jobs N] [--cache FILE]
+#   CC_daemon.py client --op OP [--input hex|base64] [files]
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import argparse
+import binascii
+import json
+import multiprocessing
+import os
+import Queue
+import signal
+import socket
+import SocketServer
+import stat
+import sys
+import tempfile
+import threading
+
+import CC_batch
+import CC_cache
+import CC_ecb
+import CC_functions
+import CC_language
+import CC_problem_6_1
+
+
+default_socket = os.path.join(tempfile.gettempdir(), "CC_daemon.sock")
+
+ops = ('single-xor', 'repeating-xor', 'ecb')
+
+
+#-------------------------------------------------------------------
+# as_text()
+#
+# Returns bytes as a unicode string for JSON, mapping every byte
+# to the code point with the same value (Latin-1).
+#-------------------------------------------------------------------
+def as_text(data):
+    return data.decode('latin-1')
+
+
+#-------------------------------------------------------------------
+# run_request()
+#
+# Returns the result dictionary for one (op, ciphertext) request
+# using the given language. Errors are returned as results so that
+# one bad request does not fail its batch.
+#-------------------------------------------------------------------
+def run_request(op, ciphertext, language):
+    try:
+        if op == 'single-xor':
+            my_db = CC_functions.search_xorval(ciphertext, language)
+            return xor_result(ciphertext, my_db['xor_value'], my_db['match'])
+        if op == 'repeating-xor':
+            (key, plaintext) = CC_problem_6_1.break_repeating_xor(
+                ciphertext, language, jobs=1)
+            return {'key': as_text(key), 'key_hex': CC_functions.hexencode(key),
+                    'plaintext': as_text(plaintext)}
+        return {'repetitions': CC_ecb.repetitions(ciphertext, False)}
+    except Exception as e:
+        return {'error': str(e)}
+
+
+#-------------------------------------------------------------------
+# xor_result()
+#
+# Returns the result of a single byte key search.
+#-------------------------------------------------------------------
+def xor_result(ciphertext, xor_value, match):
+    plaintext = CC_functions.xorstring(ciphertext, chr(xor_value))
+    return {'xor_value': xor_value, 'match': match,
+            'plaintext': as_text(plaintext)}
+
+
+#-------------------------------------------------------------------
+# run_batch()
+#
+# Returns the results for a list of (op, ciphertext) requests.
+# Without a language the language of the worker is used. It never
+# raises, since the pool has no error callback and a lost batch
+# would leave its clients waiting forever. If the batch fails as a
+# whole every request gets the error.
+#-------------------------------------------------------------------
+def run_batch(batch, language=None):
+    try:
+        if language is None:
+            language = CC_batch.worker_language
+        return [run_request(op, ciphertext, language)
+                for (op, ciphertext) in batch]
+    except Exception as e:
+        return [{'error': str(e)} for request in batch]
+
+
+#-------------------------------------------------------------------
+# decode_request()
+#
+# Returns (op, ciphertext) for a request decoded from JSON. Raises
+# ValueError if it is not a valid request.
+#-------------------------------------------------------------------
+def decode_request(request):
+    op = request.get('op')
+    if op not in ops:
+        raise ValueError("Unknown op %r, must be one of %s." %
+                         (op, ", ".join(ops)))
+    try:
+        if 'hex' in request:
+            ciphertext = binascii.unhexlify(request['hex'])
+        elif 'base64' in request:
+            ciphertext = binascii.a2b_base64(request['base64'])
+        else:
+            raise ValueError("Request has no 'hex' or 'base64' ciphertext.")
+    except (TypeError, binascii.Error, UnicodeError):
+        raise ValueError("Invalid ciphertext encoding.")
+    if not ciphertext:
+        raise ValueError("Empty ciphertext.")
+    return (op, str(ciphertext))
+
+
+#-------------------------------------------------------------------
+# Connection
+#
+# The reply side of a client connection. Replies from the
+# dispatcher and the request reader are put on a queue, which the
+# handler thread of the connection drains and writes to the client,
+# so a slow client only holds up its own replies. When the reader
+# is done and every queued request has been answered, None is put
+# on the queue to end the connection.
+#-------------------------------------------------------------------
+class Connection(object):
+    def __init__(self):
+        self.replies = Queue.Queue()
+        self.lock = threading.Lock()
+        self.outstanding = 0
+        self.reading = True
+
+
+    def send(self, reply):
+        self.replies.put(reply)
+
+
+    def queued(self):
+        with self.lock:
+            self.outstanding += 1
+
+
+    def answered(self, reply):
+        self.replies.put(reply)
+        with self.lock:
+            self.outstanding -= 1
+            self.check_done()
+
+
+    def done_reading(self):
+        with self.lock:
+            self.reading = False
+            self.check_done()
+
+
+    def check_done(self):
+        if not self.reading and not self.outstanding:
+            self.replies.put(None)
+
+
+    #---------------------------------------------------------------
+    # write_replies()
+    #
+    # Write the replies until the connection is done. A client that
+    # has gone away is ignored, but the replies are still drained.
+    #---------------------------------------------------------------
+    def write_replies(self, wfile):
+        closed = False
+        for reply in iter(self.replies.get, None):
+            if closed:
+                continue
+            try:
+                wfile.write(json.dumps(reply, sort_keys=True) + "\n")
+                wfile.flush()
+            except socket.error:
+                closed = True
+
+
+#-------------------------------------------------------------------
+# Dispatcher
+#
+# Thread owning the language model, the key search cache and the
+# worker pool. Requests and finished batches arrive on one queue so
+# that the cache is only used from this thread. jobs is the number
+# of worker processes (default one per CPU), with jobs set to 1 the
+# batches are run in this thread.
+#-------------------------------------------------------------------
+class Dispatcher(threading.Thread):
+    def __init__(self, language, jobs=None, batch_size=64, cache_file=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        if jobs is None:
+            jobs = multiprocessing.cpu_count()
+        self.language = language
+        self.jobs = jobs
+        self.batch_size = batch_size
+        self.cache_file = cache_file
+        self.events = Queue.Queue()
+        self.pending = []
+        self.in_flight = 0
+        self.pool = None
+        if jobs > 1:
+            self.pool = multiprocessing.Pool(jobs, CC_batch.init_worker,
+                                             (language,))
+
+
+    #---------------------------------------------------------------
+    # submit()
+    #
+    # Queue a request from a connection. Called by the handlers.
+    #---------------------------------------------------------------
+    def submit(self, connection, request_id, op, ciphertext):
+        connection.queued()
+        self.events.put(('request', (connection, request_id, op, ciphertext)))
+
+
+    def stop(self):
+        self.events.put(('stop', None))
+
+
+    #---------------------------------------------------------------
+    # run()
+    #
+    # Handle requests and finished batches until stopped.
+    #---------------------------------------------------------------
+    def run(self):
+        cache = CC_cache.XorCache(self.cache_file)
+        try:
+            while True:
+                (kind, item) = self.events.get()
+                if kind == 'stop':
+                    break
+                if kind == 'request':
+                    self.request(cache, item)
+                else:
+                    self.finished(cache, *item)
+                self.dispatch()
+        finally:
+            cache.close()
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool.join()
+
+
+    #---------------------------------------------------------------
+    # request()
+    #
+    # Answer a single byte key search from the cache if possible,
+    # otherwise add the request to the pending batch.
+    #---------------------------------------------------------------
+    def request(self, cache, item):
+        (connection, request_id, op, ciphertext) = item
+        if op == 'single-xor':
+            result = cache.lookup(ciphertext, self.language)
+            if result is not None:
+                self.reply(item, xor_result(ciphertext, *result))
+                return
+        self.pending.append(item)
+
+
+    #---------------------------------------------------------------
+    # dispatch()
+    #
+    # Send pending requests as batches while fewer than two batches
+    # per worker are in flight.
+    #---------------------------------------------------------------
+    def dispatch(self):
+        while self.pending and self.in_flight < 2 * self.jobs:
+            batch = self.pending[: self.batch_size]
+            self.pending = self.pending[self.batch_size :]
+            work = [(op, ciphertext) for (connection, request_id, op, ciphertext)
+                    in batch]
+            if self.pool is None:
+                self.events.put(('done', (batch, run_batch(work,
+                                                           self.language))))
+            else:
+                self.pool.apply_async(run_batch, (work,),
+                                      callback=self.callback(batch))
+            self.in_flight += 1
+
+
+    def callback(self, batch):
+        return lambda results: self.events.put(('done', (batch, results)))
+
+
+    #---------------------------------------------------------------
+    # finished()
+    #
+    # Reply to and cache the results of a finished batch.
+    #---------------------------------------------------------------
+    def finished(self, cache, batch, results):
+        self.in_flight -= 1
+        for (item, result) in zip(batch, results):
+            (connection, request_id, op, ciphertext) = item
+            if op == 'single-xor' and 'error' not in result:
+                cache.store(ciphertext, self.language, result['xor_value'],
+                            result['match'])
+            self.reply(item, result)
+
+
+    def reply(self, item, result):
+        (connection, request_id, op, ciphertext) = item
+        reply = dict(result)
+        reply['id'] = request_id
+        reply['op'] = op
+        connection.answered(reply)
+
+
+#-------------------------------------------------------------------
+# Handler
+#
+# Reads request lines from a client in a reader thread and queues
+# them, while the handler thread writes the replies. Invalid
+# requests are answered directly with an error. The connection is
+# closed when every request has been answered.
+#-------------------------------------------------------------------
+class Handler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        connection = Connection()
+        reader = threading.Thread(target=self.read_requests,
+                                  args=(connection,))
+        reader.daemon = True
+        reader.start()
+        connection.write_replies(self.wfile)
+        reader.join()
+
+
+    # Replies not yet flushed to a client that has gone away are
+    # dropped when the connection is closed.
+    def finish(self):
+        try:
+            SocketServer.StreamRequestHandler.finish(self)
+        except socket.error:
+            pass
+
+
+    def read_requests(self, connection):
+        try:
+            for line in iter(self.rfile.readline, ""):
+                if not line.strip():
+                    continue
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Request must be a JSON object.")
+                    request_id = request.get('id')
+                    (op, ciphertext) = decode_request(request)
+                except ValueError as e:
+                    connection.send({'id': request_id, 'error': str(e)})
+                    continue
+                self.server.dispatcher.submit(connection, request_id, op,
+                                              ciphertext)
+        except socket.error:
+            pass
+        finally:
+            connection.done_reading()
+
+
+#-------------------------------------------------------------------
+# Server
+#
+# Threaded Unix domain socket server with a dispatcher.
+#-------------------------------------------------------------------
+class Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, dispatcher):
+        remove_stale_socket(path)
+        self.path = None
+        self.dispatcher = dispatcher
+        SocketServer.UnixStreamServer.__init__(self, path, Handler)
+        self.path = path
+
+
+    #---------------------------------------------------------------
+    # server_close()
+    #
+    # Close the socket and remove it, unless the bind failed and the
+    # path belongs to something else.
+    #---------------------------------------------------------------
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+#-------------------------------------------------------------------
+# remove_stale_socket()
+#
+# Remove a socket left at the path by a server that is no longer
+# running. Anything else at the path, a file or the socket of a
+# running server, is left alone and makes the bind fail.
+#-------------------------------------------------------------------
+def remove_stale_socket(path):
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return
+    if not stat.S_ISSOCK(mode):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        os.remove(path)
+    finally:
+        sock.close()
+
+
+#-------------------------------------------------------------------
+# serve()
+#
+# Run the server on the socket path until interrupted or
+# terminated. The socket is removed and the cache flushed on exit.
+#-------------------------------------------------------------------
+def serve(path=default_socket, jobs=None, batch_size=64, cache_file=None):
+    dispatcher = Dispatcher(CC_language.english(), jobs, batch_size,
+                            cache_file)
+    dispatcher.start()
+    server = Server(path, dispatcher)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dispatcher.stop()
+        dispatcher.join()
+
+
+#-------------------------------------------------------------------
+# Client
+#
+# Client for the server. request() sends one request and waits for
+# its reply. requests() pipelines a request for every ciphertext
+# and generates the replies as they arrive, with the index of the
+# ciphertext as id. An error from generating the ciphertexts, such
+# as invalid input, is raised after the replies to the requests
+# sent before it.
+#-------------------------------------------------------------------
+class Client(object):
+    def __init__(self, path=default_socket):
+        self.path = path
+
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        return sock
+
+
+    def request(self, op, ciphertext):
+        for reply in self.requests(op, [ciphertext]):
+            return reply
+
+
+    def requests(self, op, ciphertexts):
+        sock = self.connect()
+        errors = []
+        try:
+            writer = threading.Thread(target=send_requests,
+                                      args=(sock, op, ciphertexts, errors))
+            writer.daemon = True
+            writer.start()
+            for line in sock.makefile('rb'):
+                yield json.loads(line)
+            writer.join()
+        finally:
+            sock.close()
+        if errors:
+            raise errors[0]
+
+
+#-------------------------------------------------------------------
+# send_requests()
+#
+# Write a request for every ciphertext to the socket and close the
+# sending side when done. The sending side is closed also when the
+# ciphertexts raise an error, so that the replies to the requests
+# already sent end, and the error is appended to errors.
+#-------------------------------------------------------------------
+def send_requests(sock, op, ciphertexts, errors):
+    try:
+        for (index, ciphertext) in enumerate(ciphertexts):
+            request = {'id': index, 'op': op,
+                       'hex': CC_functions.hexencode(ciphertext)}
+            sock.sendall(json.dumps(request) + "\n")
+    except socket.error:
+        pass
+    except Exception as e:
+        errors.append(e)
+    try:
+        sock.shutdown(socket.SHUT_WR)
+    except socket.error:
+        pass
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Run the server or the client. The client reads one ciphertext per
+# line from the files or stdin and writes the replies as JSON lines.
+# It exits with status 1 at the first line that can not be decoded.
+#-------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="CC scoring server.")
+    parser.add_argument("--socket", default=default_socket,
+                        help="Socket path, default %s." % default_socket)
+    commands = parser.add_subparsers(dest="command")
+
+    command = commands.add_parser("serve", help="Run the server.")
+    command.add_argument("--jobs", type=int, default=None,
+                         help="Number of worker processes, default one per CPU.")
+    command.add_argument("--batch-size", type=int, default=64,
+                         help="Largest batch sent to a worker, default 64.")
+    command.add_argument("--cache", default=None,
+                         help="sqlite3 file for the key search cache.")
+
+    command = commands.add_parser("client", help="Send ciphertexts.")
+    command.add_argument("--op", choices=ops, required=True)
+    command.add_argument("--input", choices=['hex', 'base64'], default='hex',
+                         help="Encoding of the input lines, default hex.")
+    command.add_argument("files", nargs="*", help="Input files, default stdin.")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.socket, args.jobs, args.batch_size, args.cache)
+        return
+
+    import fileinput
+    lines = (line.strip() for line in fileinput.input(args.files or ['-']))
+    if args.input == 'hex':
+        ciphertexts = (CC_functions.hexdecode(line) for line in lines)
+    else:
+        ciphertexts = (binascii.a2b_base64(line) for line in lines)
+    try:
+        for reply in Client(args.socket).requests(args.op, ciphertexts):
+            sys.stdout.write(json.dumps(reply, sort_keys=True) + "\n")
+            sys.stdout.flush()
+    except (ValueError, binascii.Error) as e:
+        sys.stderr.write("%s: error: %s\n" % (parser.prog, e))
+        sys.exit(1)
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_daemon.py
+#=======================================================================
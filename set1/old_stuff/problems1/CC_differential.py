@@ -0,0 +1,295 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_differential.py
+# ------------------
+# Differential test and benchmark of the CC codecs, and the Base64
+# codec in set1/challenge1, against the binascii and base64 modules.
+# Every codec is run side by side with its standard library
+# reference on edge cases and random inputs, and any output that
+# differs is reported. Inputs the reference rejects must be
+# rejected by the codec too.
+#
+# Both are then timed on the same inputs and the time of the codec
+# relative to the reference is reported. A ratio close to 1 means
+# the codec runs at C speed. With --history the ratios of the run
+# are appended to the given file, so they can be followed over
+# time and compared with the previous run.
+#
+# Usage:
+#   CC_differential.py [--cases N] [--max-size 1M] [--only names]
+#                      [--history FILE]
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import argparse
+import base64
+import binascii
+import imp
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import CC_benchmark
+import CC_functions
+
+
+# The Base64 codec of challenge 1. Its module is named base64 like
+# the standard library module, so it is loaded from its file under
+# another name.
+challenge1_file = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "..", "..", "challenge1", "base64.py")
+challenge1 = imp.load_source("challenge1_base64", challenge1_file).Base64()
+
+# Sizes in bytes of the decoded data for the timing.
+sizes = [60, 1024, 64 * 1024, 1024 * 1024]
+
+
+#-------------------------------------------------------------------
+# The codecs as (name, codec, reference, input) tuples. The codec
+# and reference are given the same input, which is a hex string,
+# Base64 text or raw bytes, and must return equal results.
+#-------------------------------------------------------------------
+codecs = [("hex2base64", CC_functions.hex2base64,
+           lambda hexstring: base64.b64encode(binascii.unhexlify(hexstring)),
+           'hex'),
+          ("hexstring2string", CC_functions.hexstring2string,
+           binascii.unhexlify, 'hex'),
+          ("string2val", CC_functions.string2val,
+           lambda hexstring: bytearray(binascii.unhexlify(hexstring)), 'hex'),
+          ("hexencode", CC_functions.hexencode, binascii.hexlify, 'bytes'),
+          ("challenge1_encode", challenge1.encode, base64.b64encode,
+           'bytes'),
+          ("challenge1_decode", challenge1.decode, binascii.a2b_base64,
+           'base64')]
+
+
+#-------------------------------------------------------------------
+# mixed_case()
+#
+# Returns the hex string with every digit in random case.
+#-------------------------------------------------------------------
+def mixed_case(hexstring, rng):
+    return "".join([rng.choice((c.lower(), c.upper())) for c in hexstring])
+
+
+#-------------------------------------------------------------------
+# test_inputs()
+#
+# Returns a list of (description, input) for the input kind: the
+# empty input, every length up to 7 bytes so that all lengths
+# modulo 3 are covered, all byte values and num random inputs.
+# Hex inputs are lower, upper and mixed case, and include inputs
+# with odd length and invalid digits that must be rejected. Base64
+# inputs are on one line and split into lines, and include bad
+# padding and invalid characters that must be rejected. Unpadded
+# text, which binascii rejects but the challenge 1 codec accepts on
+# purpose, is left out.
+#-------------------------------------------------------------------
+def test_inputs(kind, num, rng):
+    strings = [("empty", "")]
+    for length in range(1, 8):
+        strings.append(("length %d" % length,
+                        "".join([chr(rng.randrange(256))
+                                 for i in range(length)])))
+    strings.append(("all byte values", "".join(map(chr, range(256)))))
+    for i in range(num):
+        length = rng.choice((rng.randrange(64), rng.randrange(4096)))
+        strings.append(("random %d bytes" % length,
+                        "".join([chr(rng.randrange(256))
+                                 for j in range(length)])))
+    if kind == 'bytes':
+        return strings
+
+    if kind == 'base64':
+        inputs = []
+        for (description, string) in strings:
+            inputs.append((description, base64.b64encode(string)))
+            inputs.append((description + ", lines",
+                           base64.encodestring(string)))
+            inputs.append((description + ", CRLF lines",
+                           base64.encodestring(string).replace("\n", "\r\n")))
+        inputs.append(("padding inside group", "QQ=A"))
+        inputs.append(("padding first", "=QUJ"))
+        inputs.append(("single character", "Q"))
+        inputs.append(("invalid character", "QU*D"))
+        return inputs
+
+    inputs = []
+    for (description, string) in strings:
+        hexstring = binascii.hexlify(string)
+        inputs.append((description, hexstring))
+        inputs.append((description + ", upper case", hexstring.upper()))
+        inputs.append((description + ", mixed case",
+                       mixed_case(hexstring, rng)))
+    inputs.append(("odd length", "abc"))
+    inputs.append(("invalid digit", "0g"))
+    inputs.append(("hex prefix", "0x12"))
+    inputs.append(("sign", "-1"))
+    return inputs
+
+
+#-------------------------------------------------------------------
+# call()
+#
+# Returns ('ok', result) or ('error', exception name) for a call of
+# the function with the input.
+#-------------------------------------------------------------------
+def call(function, data):
+    try:
+        return ('ok', function(data))
+    except (ValueError, TypeError, AssertionError, binascii.Error) as e:
+        return ('error', type(e).__name__)
+
+
+#-------------------------------------------------------------------
+# check_codec()
+#
+# Returns a list of (description, input, codec result, reference
+# result) for every input where the codec and reference disagree.
+# An error from both is agreement, whatever the exception types.
+#-------------------------------------------------------------------
+def check_codec(codec, reference, inputs):
+    mismatches = []
+    for (description, data) in inputs:
+        expected = call(reference, data)
+        result = call(codec, data)
+        if expected[0] == 'error' and result[0] == 'error':
+            continue
+        if result != expected:
+            mismatches.append((description, data, result, expected))
+    return mismatches
+
+
+#-------------------------------------------------------------------
+# time_codec()
+#
+# Returns (codec seconds, reference seconds) for one call on an
+# input of size bytes, or the hex string or Base64 text of it.
+#-------------------------------------------------------------------
+def time_codec(codec, reference, kind, size):
+    data = CC_benchmark.random_string(size)
+    if kind == 'hex':
+        data = binascii.hexlify(data)
+    elif kind == 'base64':
+        data = base64.b64encode(data)
+    return (CC_benchmark.measure(lambda: codec(data)),
+            CC_benchmark.measure(lambda: reference(data)))
+
+
+#-------------------------------------------------------------------
+# load_history()
+#
+# Returns the list of runs in the history file.
+#-------------------------------------------------------------------
+def load_history(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+#-------------------------------------------------------------------
+# save_run()
+#
+# Append a run to the history file.
+#-------------------------------------------------------------------
+def save_run(run, filename):
+    with open(filename, 'a') as f:
+        f.write(json.dumps(run, sort_keys=True) + "\n")
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Check and time the codecs given on the command line. Exits with
+# status 1 if any codec disagrees with its reference.
+#-------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check and time the CC codecs against binascii.")
+    parser.add_argument("--cases", type=int, default=200,
+                        help="Number of random inputs per codec, default 200.")
+    parser.add_argument("--seed", type=int, default=24,
+                        help="Seed for the random inputs, default 24.")
+    parser.add_argument("--max-size", type=CC_benchmark.parse_size,
+                        default=None,
+                        help="Skip timing sizes above this, e.g. 64K.")
+    parser.add_argument("--only", default=None,
+                        help="Comma separated codec names to run.")
+    parser.add_argument("--history", default=None,
+                        help="JSON lines file to append the ratios to, "
+                        "compared with the last run in it.")
+    args = parser.parse_args()
+
+    only = None
+    if args.only:
+        only = args.only.split(",")
+    history = []
+    if args.history:
+        history = load_history(args.history)
+    previous = {}
+    if history:
+        previous = dict([((result['name'], result['size']), result['ratio'])
+                         for result in history[-1]['results']])
+
+    failed = False
+    results = []
+    for (name, codec, reference, kind) in codecs:
+        if only and name not in only:
+            continue
+        rng = random.Random(args.seed)
+        inputs = test_inputs(kind, args.cases, rng)
+        mismatches = check_codec(codec, reference, inputs)
+        print "%-20s %d inputs, %d mismatches" %\
+              (name, len(inputs), len(mismatches))
+        for (description, data, result, expected) in mismatches[:10]:
+            print "  Mismatch for %s: %r" % (description, data[:40])
+            print "    got %r" % (result,)
+            print "    expected %r" % (expected,)
+        if mismatches:
+            failed = True
+
+        for size in sizes:
+            if args.max_size is not None and size > args.max_size:
+                continue
+            (seconds, reference_seconds) = time_codec(codec, reference,
+                                                      kind, size)
+            ratio = seconds / reference_seconds
+            results.append({'name': name, 'size': size, 'seconds': seconds,
+                            'reference_seconds': reference_seconds,
+                            'ratio': ratio})
+            change = ""
+            if (name, size) in previous:
+                change = "(was %.2fx)" % previous[(name, size)]
+            print "  %10d bytes %10.3f MB/s %8.2fx stdlib time %s" %\
+                  (size, size / seconds / 1e6, ratio, change)
+
+    if results and args.history:
+        save_run({'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  'python': platform.python_version(),
+                  'machine': platform.machine(),
+                  'results': results}, args.history)
+
+    if failed:
+        sys.exit(1)
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_differential.py
+#=======================================================================
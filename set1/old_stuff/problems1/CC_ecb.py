@@ -0,0 +1,197 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_ecb.py
+# ---------
+# Detection of ECB encrypted ciphertexts by finding repeated
+# blocks. ECB is stateless and deterministic, so equal plaintext
+# blocks give equal ciphertext blocks.
+#
+# Lines are streamed and indexed one at a time, either in the
+# calling process or spread over a pool of worker processes. A
+# whole file can also be scanned for blocks reused across lines
+# using a fixed size table, so memory use does not grow with the
+# size of the file.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import heapq
+import multiprocessing
+
+import CC_batch
+import CC_functions
+
+
+#-------------------------------------------------------------------
+# line_data()
+#
+# Returns a line without its line ending. Hex lines are stripped of
+# all surrounding whitespace. Raw lines only lose a trailing
+# newline, since any other byte can be part of the ciphertext.
+#-------------------------------------------------------------------
+def line_data(line, is_hex=True):
+    if is_hex:
+        return line.strip()
+    if line.endswith("\n"):
+        return line[:-1]
+    return line
+
+
+#-------------------------------------------------------------------
+# line_blocks()
+#
+# Returns the list of complete blocks of blocksize bytes in a line.
+# If is_hex is set the line is hex decoded first. A trailing partial
+# block is ignored.
+#-------------------------------------------------------------------
+def line_blocks(line, is_hex=True, blocksize=16):
+    if is_hex:
+        line = CC_functions.hexdecode(line)
+    return [line[offset : offset + blocksize] for offset in
+            xrange(0, len(line) - blocksize + 1, blocksize)]
+
+
+#-------------------------------------------------------------------
+# repetitions()
+#
+# Returns the number of blocks in a line that are equal to an
+# earlier block in the same line.
+#-------------------------------------------------------------------
+def repetitions(line, is_hex=True, blocksize=16):
+    blocks = line_blocks(line, is_hex, blocksize)
+    return len(blocks) - len(set(blocks))
+
+
+#-------------------------------------------------------------------
+# count_chunk()
+#
+# Returns the list of (index, repetitions) for a chunk of
+# (index, line) pairs.
+#-------------------------------------------------------------------
+def count_chunk(chunk, is_hex=True, blocksize=16):
+    return [(index, repetitions(line, is_hex, blocksize))
+            for (index, line) in chunk]
+
+
+#-------------------------------------------------------------------
+# scan()
+#
+# Given an iterable of lines, generates (index, repetitions) for
+# every line in order. Line endings are removed with line_data().
+#
+# The lines are consumed lazily in chunks of chunksize and counted
+# by jobs worker processes (default one per CPU). At most two
+# chunks per worker are in flight at any time. With jobs set to 1
+# the lines are counted in the calling process without starting
+# a pool.
+#-------------------------------------------------------------------
+def scan(lines, is_hex=True, blocksize=16, jobs=None, chunksize=1000):
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    lines = (line_data(line, is_hex) for line in lines)
+
+    if jobs == 1:
+        for chunk in CC_batch.chunks(lines, chunksize):
+            for result in count_chunk(chunk, is_hex, blocksize):
+                yield result
+        return
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        pending = []
+        for chunk in CC_batch.chunks(lines, chunksize):
+            pending.append(pool.apply_async(count_chunk,
+                                            (chunk, is_hex, blocksize)))
+            while len(pending) >= 2 * jobs:
+                for result in pending.pop(0).get():
+                    yield result
+
+        for job in pending:
+            for result in job.get():
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+#-------------------------------------------------------------------
+# detect_ecb()
+#
+# Returns a list with the top (repetitions, index) tuples for the
+# lines with repeated blocks, most repetitions first. Lines without
+# repeated blocks are never returned. Only the top results are
+# kept while the lines are scanned.
+#-------------------------------------------------------------------
+def detect_ecb(lines, is_hex=True, blocksize=16, top=1, jobs=None,
+               chunksize=1000):
+    results = ((count, -index) for (index, count) in
+               scan(lines, is_hex, blocksize, jobs, chunksize) if count)
+    return [(count, -index) for (count, index) in
+            heapq.nlargest(top, results)]
+
+
+#-------------------------------------------------------------------
+# BlockTable
+#
+# Fixed size hash table mapping blocks to the index of the line
+# they were first seen in. Every block has a single slot given by
+# its hash. A new block in an occupied slot evicts the old one, so
+# the table never holds more than size blocks. Reuse of an evicted
+# block is not found, which makes the result a lower bound.
+#-------------------------------------------------------------------
+class BlockTable(object):
+    def __init__(self, size=1 << 20):
+        if size < 1 or size & (size - 1):
+            raise ValueError("Table size must be a power of two, got %d." %
+                             size)
+        self.mask = size - 1
+        self.blocks = [None] * size
+        self.indices = [0] * size
+        self.evictions = 0
+
+
+    #---------------------------------------------------------------
+    # add()
+    #
+    # Add a block seen in the given line. Returns the index of the
+    # line the block was first seen in if it is in the table,
+    # otherwise None.
+    #---------------------------------------------------------------
+    def add(self, block, index):
+        slot = hash(block) & self.mask
+        if self.blocks[slot] == block:
+            return self.indices[slot]
+        if self.blocks[slot] is not None:
+            self.evictions += 1
+        self.blocks[slot] = block
+        self.indices[slot] = index
+        return None
+
+
+#-------------------------------------------------------------------
+# cross_line_reuse()
+#
+# Given an iterable of lines, generates (index, offset, first index)
+# for every block that was seen in an earlier line. The offset is
+# the byte offset of the block in the decoded line. Reuse within a
+# line is reported by scan(). The blocks are kept in a BlockTable
+# with table_size slots.
+#-------------------------------------------------------------------
+def cross_line_reuse(lines, is_hex=True, blocksize=16, table_size=1 << 20):
+    table = BlockTable(table_size)
+    for (index, line) in enumerate(lines):
+        blocks = line_blocks(line_data(line, is_hex), is_hex, blocksize)
+        for (num, block) in enumerate(blocks):
+            first = table.add(block, index)
+            if first is not None and first != index:
+                yield (index, num * blocksize, first)
+
+#=======================================================================
+# EOF CC_ecb.py
+#=======================================================================
@@ -13,19 +13,22 @@
 #
 #=======================================================================
 
+import array
+import binascii
 import math
 
+import CC_hamming
+import CC_language
+import CC_metrics
+
 #-------------------------------------------------------------------
 # num_substrings()
 #
 # Given a string and a list of substrings returns the total number
-# of substrings in the string.
+# of substrings in the string. The substrings are lower cased.
 #-------------------------------------------------------------------
 def num_substrings(string, substrings):
-    num = 0
-    for ch in substrings:
-        num += string.count(ch.lower())
-    return num
+    return CC_language.ngram_counter(substrings).count(string)
 
 
 #-------------------------------------------------------------------
@@ -36,9 +39,20 @@ def num_substrings(string, substrings):
 # as keys in a dictionary. For each letter their frequency in the
 # string is calculated. All letters not in the alphabet is
 # accumulated into a separate key-value.
+#
+# The language is either the (alphabet, bigrams, trigrams) tuple
+# or a CC_language.LanguageModel that does the matching using its
+# precomputed tables.
 #-------------------------------------------------------------------
 def match_string_language(string, language):
+    string = as_bytes(string)
+    if isinstance(language, CC_language.LanguageModel):
+        return language.match(string)
+
     (alphabet, bigrams, trigrams) = language
+    metrics = CC_metrics.collector
+    if metrics is not None:
+        start = CC_metrics.timer()
 
     my_db = {}
     my_db['length'] = len(string)
@@ -55,10 +69,17 @@ def match_string_language(string, language):
             my_db[c] = 0
             my_db['not_in_alphabet'] += 1
 
+    if metrics is not None:
+        metrics.record('match.letters', start, len(string))
+        start = CC_metrics.timer()
+
     # Match the string against bigrams and trigrams.
     my_db['bigrams'] = num_substrings(string, bigrams)
     my_db['trigrams'] = num_substrings(string, trigrams)
 
+    if metrics is not None:
+        metrics.record('match.ngrams', start, len(string))
+
     # Here we do the string matching operation. Based on
     # number of trigrams, bigrams, frequency and amount
     # of characters not in the alphabet we create a match value.
@@ -79,6 +100,204 @@ def match_string_language(string, language):
     return my_db
 
 
+#-------------------------------------------------------------------
+# byte_histogram()
+#
+# Returns a list with 256 elements where element i is the number
+# of times the byte value i occurs in the given string.
+#-------------------------------------------------------------------
+def byte_histogram(string):
+    histogram = [0] * 256
+    for ch in set(string):
+        histogram[ord(ch)] = string.count(ch)
+    return histogram
+
+
+#-------------------------------------------------------------------
+# xor_table()
+#
+# Returns a 256 byte translation table that XORs every byte with
+# the given value. Used with str.translate() to XOR a whole string
+# with a single byte without building it one character at a time.
+#-------------------------------------------------------------------
+xor_tables = {}
+
+def xor_table(xor_value):
+    if xor_value not in xor_tables:
+        xor_tables[xor_value] = "".join([chr(i ^ xor_value) for i in range(256)])
+    return xor_tables[xor_value]
+
+
+#-------------------------------------------------------------------
+# ngram_bounds()
+#
+# Returns a list with the upper bound of num_substrings() for every
+# XOR value given the string, the XOR differences of its
+# neighbouring bytes, its histogram and present byte values and a
+# difference table from CC_language.difference_table().
+#
+# Every position where the differences match an n-gram adds to the
+# count of the one XOR value that turns the byte there into the
+# first character of the n-gram. This is the number of overlapping
+# matches, which is the exact count for n-grams that can not
+# overlap themselves and an upper bound for the others.
+#-------------------------------------------------------------------
+def ngram_bounds(string, differences, histogram, present, difference_table):
+    (table, empty) = difference_table
+    bounds = [empty * (len(string) + 1)] * 256
+    find = differences.find
+    for (signature, firsts) in table:
+        if not signature:
+            for (first, multiplicity) in firsts:
+                for val in present:
+                    bounds[val ^ first] += multiplicity * histogram[val]
+            continue
+        pos = find(signature)
+        while pos >= 0:
+            val = ord(string[pos])
+            for (first, multiplicity) in firsts:
+                bounds[val ^ first] += multiplicity
+            pos = find(signature, pos + 1)
+    return bounds
+
+
+#-------------------------------------------------------------------
+# search_xorval()
+#
+# Returns the match_string_language() dictionary for the byte
+# value the string most probably has been XORed with. The XOR
+# value is stored under the key 'xor_value'.
+#
+# XORing with a single byte only permutes the byte values in the
+# string. We therefore build one histogram of the string and get
+# the letter counts for every XOR value by permuting the histogram
+# instead of XORing and scanning the string 256 times. This gives
+# the frequency part of the match for all XOR values. Only present
+# byte values are visited, and the distance is expanded as
+#
+#   sum((c/n - e)^2) = sum(e^2) - 2/n * sum(c * e) + sum(c^2)/n^2
+#
+# so the sums can be accumulated per XOR value.
+#
+# The XOR of two neighbouring bytes is not changed by the XOR
+# value either, so the bigram and trigram matches for all XOR
+# values are found in one pass over the XOR differences of the
+# string, see ngram_bounds(). These are overlapping counts, which
+# is an upper bound of the counts. We add them to the frequency
+# part and rank the XOR values on this bound. The candidates are
+# then fully matched in ranked order until no remaining candidate
+# can beat the best match. The bound is close to the match, so
+# usually only one or two candidates are matched. The result is
+# the same XOR value as when matching all 256 candidates,
+# including picking the lowest value on ties.
+#-------------------------------------------------------------------
+window_candidates = 8
+
+def search_xorval(string, language):
+    string = as_bytes(string)
+    if isinstance(language, CC_language.LanguageModel):
+        (letters, bigram_table, trigram_table) = language.tables
+    else:
+        (letters, bigram_table, trigram_table) =\
+            CC_language.scoring_tables(*language)
+    metrics = CC_metrics.collector
+    if metrics is not None:
+        start = CC_metrics.timer()
+
+    length = len(string)
+    flength = float(length)
+    histogram = byte_histogram(string)
+    present = [val for val in range(256) if histogram[val]]
+
+    if metrics is not None:
+        metrics.record('search.histogram', start, length)
+        start = CC_metrics.timer()
+
+    # Accumulate the letter counts for every XOR value. When the
+    # language folds case a letter has more than one source and the
+    # sum of squared counts becomes a lower bound.
+    in_alphabet = [0] * 256
+    weighted = [0.0] * 256
+    squares = [0] * 256
+    expected_squares = 0.0
+    for (freq, sources) in letters:
+        expected_squares += freq * freq
+        for source in sources:
+            for val in present:
+                count = histogram[val]
+                xor_value = source ^ val
+                in_alphabet[xor_value] += count
+                weighted[xor_value] += count * freq
+                squares[xor_value] += count * count
+
+    differences = xorblock(string[:-1], string[1:])
+    bigram_bounds = ngram_bounds(string, differences, histogram, present,
+                                 bigram_table)
+    trigram_bounds = ngram_bounds(string, differences, histogram, present,
+                                  trigram_table)
+
+    # The upper bound of the match for every XOR value. A small
+    # margin covers rounding differences in the distance sum.
+    bounds = []
+    for xor_value in range(256):
+        distance = (expected_squares - 2 * weighted[xor_value] / flength +
+                    squares[xor_value] / (flength * flength))
+        bound = (10 * trigram_bounds[xor_value] + 5 * bigram_bounds[xor_value] +
+                 (1 - distance) + 1e-6)
+        if ((float(length - in_alphabet[xor_value]) / flength) > 0.5):
+            bound = bound - 100.0
+        bounds.append((-bound, xor_value))
+    bounds.sort()
+
+    if metrics is not None:
+        metrics.record('search.bounds', start)
+        start = CC_metrics.timer()
+
+    # Fully match the candidates in ranked order. When at least
+    # window_candidates candidates remain after the first one with
+    # a language model, the n-grams are counted from window
+    # histograms of the string built once instead of scanning every
+    # candidate for every n-gram, see CC_language.NgramCounter. This
+    # can not be done when the model folds case, since a folded
+    # n-gram has more than one XORed form.
+    counters = None
+    if isinstance(language, CC_language.LanguageModel) and not language.fold_case:
+        counters = (language.bigram_counter, language.trigram_counter)
+    windows = None
+    reference = None
+    evaluated = 0
+    for (bound, xor_value) in bounds:
+        if reference is not None:
+            if -bound < reference['match']:
+                break
+            if -bound == reference['match'] and xor_value > reference['xor_value']:
+                break
+
+        teststring = string.translate(xor_table(xor_value))
+        if (windows is None and counters is not None and evaluated == 1 and
+            len([entry for entry in bounds if -entry[0] >= reference['match']]) >=
+            window_candidates):
+            windows = [counter.windows(string) for counter in counters]
+        if windows is None:
+            my_db = match_string_language(teststring, language)
+        else:
+            my_db = language.match(teststring, [
+                counter.count_xor(string, counter_windows, xor_value)
+                for (counter, counter_windows) in zip(counters, windows)])
+        evaluated += 1
+        my_db['xor_value'] = xor_value
+        if ((reference is None) or (my_db['match'] > reference['match']) or
+            (my_db['match'] == reference['match'] and
+             xor_value < reference['xor_value'])):
+            reference = my_db
+
+    if metrics is not None:
+        metrics.record('search.candidates', start)
+        metrics.count('search.candidates_evaluated', evaluated)
+        metrics.count('search.keys', 256)
+    return reference
+
+
 #-------------------------------------------------------------------
 # findxorval()
 #
@@ -98,25 +317,118 @@ def match_string_language(string, language):
 #
 # For good candidates we calculate a fitness value based on
 # the accumulated deviation from the expected frequency.
+#
+# The language is either the (alphabet, bigrams, trigrams) tuple
+# or a CC_language.LanguageModel. See search_xorval() for how the
+# candidates are evaluated.
+#
+# If a CC_cache.XorCache is given the result is taken from, or
+# added to, the cache.
 #-------------------------------------------------------------------
-def findxorval(string, language):
-    # We start by getting the statistics for the given string
-    # as a reference.
-    reference = match_string_language(string, language)
-    reference['xor_value'] = 0
-
-    # Scan through possible XOR values and keep the one
-    # with the best match.
-    for xor_value in range(1, 256):
-        my_db = {}
-        teststring = (xorstring(string, chr(xor_value)))
-        my_db = match_string_language(teststring, language)
-        my_db['xor_value'] = xor_value
-        
-        if (my_db['match'] > reference['match']):
-            reference.update(my_db)
-        
-    return reference['xor_value']
+def findxorval(string, language, cache=None):
+    if cache is not None:
+        return cache.search(string, language)[0]
+    return search_xorval(string, language)['xor_value']
+
+
+#-------------------------------------------------------------------
+# as_bytes()
+#
+# Returns the given str, bytearray, buffer or memoryview as a str.
+# A str is returned as is without copying. Other objects with a
+# tobytes() method are asked for their bytes.
+#-------------------------------------------------------------------
+def as_bytes(data):
+    if isinstance(data, str):
+        return data
+    tobytes = getattr(data, 'tobytes', None)
+    if tobytes is not None:
+        return tobytes()
+    return memoryview(data).tobytes()
+
+
+#-------------------------------------------------------------------
+# xorblock()
+#
+# Returns the XOR of two strings of equal length. The strings are
+# converted to integers and XORed as one wide integer instead of
+# one character at a time.
+#-------------------------------------------------------------------
+def xorblock(string1, string2):
+    assert len(string1) == len(string2), "Strings are not equal length."
+    if not string1:
+        return ""
+    value = int(binascii.hexlify(string1), 16) ^\
+            int(binascii.hexlify(string2), 16)
+    return binascii.unhexlify("%0*x" % (2 * len(string1), value))
+
+
+#-------------------------------------------------------------------
+# xorbuffer()
+#
+# XOR the first length bytes of the bytearray buf in place with the
+# repeating key, starting with key byte phase. Key byte i is used
+# for every len(key)th byte, so each column buf[i::len(key)] is XORed
+# with one translate() and the work per call is one C-level pass per
+# key byte. Returns the key phase after the bytes.
+#-------------------------------------------------------------------
+def xorbuffer(buf, key, phase=0, length=None):
+    if length is None:
+        length = len(buf)
+    keylen = len(key)
+    for i in xrange(min(keylen, length)):
+        table = xor_table(ord(key[(phase + i) % keylen]))
+        buf[i:length:keylen] = buf[i:length:keylen].translate(table)
+    return (phase + length) % keylen
+
+
+#-------------------------------------------------------------------
+# xorchunks()
+#
+# Generator XORing an iterable of strings with a repeating key as
+# if the strings were one long string. The key phase is carried
+# over from one chunk to the next. Each chunk is processed in
+# blocks of about blocksize bytes so that memory use does not
+# depend on the chunk size. Blocks are at least 256 bytes per key
+# byte, so that the columns XORed by xorbuffer() are long enough
+# for long keys too.
+#-------------------------------------------------------------------
+def xorchunks(chunks, key, blocksize=65536):
+    key = as_bytes(key)
+    assert len(key) > 0, "XOR key must not be empty."
+
+    blocksize = max(blocksize // len(key), 256) * len(key)
+    phase = 0
+    for chunk in chunks:
+        chunk = as_bytes(chunk)
+        metrics = CC_metrics.collector
+        if metrics is not None:
+            start = CC_metrics.timer()
+
+        if len(key) == 1:
+            result = chunk.translate(xor_table(ord(key)))
+        else:
+            blocks = []
+            for offset in xrange(0, len(chunk), blocksize):
+                block = bytearray(buffer(chunk, offset, blocksize))
+                phase = xorbuffer(block, key, phase)
+                blocks.append(str(block))
+            result = "".join(blocks)
+
+        if metrics is not None:
+            metrics.record('xor', start, len(chunk))
+        yield result
+
+
+#-------------------------------------------------------------------
+# hamming_distance()
+#
+# Returns the number of differing bits between two strings of
+# equal length. See CC_hamming for the pairwise functions.
+#-------------------------------------------------------------------
+def hamming_distance(string1, string2):
+    assert len(string1) == len(string2), "Strings must be the same length."
+    return CC_hamming.distance(as_bytes(string1), as_bytes(string2))
 
 
 #-------------------------------------------------------------------
@@ -125,14 +437,115 @@ def findxorval(string, language):
 # Returns a string that consist of the given XORed with the
 # given xorstring. If the xorstring is shorter than the given
 # input string, the xorstring is applied repeatedly.
+#
+# Both arguments can be a str, bytearray or memoryview. The result
+# is a str.
 #-------------------------------------------------------------------
 def xorstring(string, xorstring):
-    outstring = ""
-    i = 0
-    for ch in string:
-        outstring += chr(ord(ch) ^ ord(xorstring[i]))
-        i = (i + 1) % len(xorstring)
-    return outstring
+    return "".join(xorchunks([string], xorstring))
+
+
+#-------------------------------------------------------------------
+# xorstream()
+#
+# XOR everything read from the file-like object infile with the
+# repeating key and write the result to outfile. The input is
+# read chunksize bytes at a time so memory use is constant.
+# Returns the number of bytes processed.
+#-------------------------------------------------------------------
+def xorstream(infile, outfile, key, chunksize=65536):
+    num = 0
+    chunks = iter(lambda: infile.read(chunksize), "")
+    for chunk in xorchunks(chunks, key):
+        outfile.write(chunk)
+        num += len(chunk)
+    return num
+
+
+#-------------------------------------------------------------------
+# Lookup tables for hex conversion. hex_digits contains all valid
+# hexadecimal characters, hex_pairs maps every pair of hexadecimal
+# characters in upper or lower case to the character with that
+# value and hex_bytes maps every byte value to its lower case pair.
+# hex_whitespace is skipped between the digits of hex streams.
+#-------------------------------------------------------------------
+hex_digits = "0123456789abcdefABCDEF"
+hex_whitespace = " \t\n\r\f\v"
+hex_pairs = dict([(high + low, chr(int(high + low, 16)))
+                  for high in hex_digits for low in hex_digits])
+hex_bytes = ["%02x" % val for val in range(256)]
+
+
+#-------------------------------------------------------------------
+# hexdecode()
+#
+# Returns the string with the values given by a string of
+# hexadecimal values. Both upper and lower case are accepted and
+# whitespace, including line breaks, is ignored.
+#
+# The whole string is validated with one translate() call before
+# it is decoded two characters at a time using the pair table.
+# Invalid input raises ValueError, as for the other hex functions.
+#-------------------------------------------------------------------
+def hexdecode(hexstring):
+    hexstring = as_bytes(hexstring)
+    metrics = CC_metrics.collector
+    if metrics is not None:
+        start = CC_metrics.timer()
+
+    invalid = hexstring.translate(None, hex_digits)
+    if invalid:
+        hexstring = "".join(hexstring.split())
+        invalid = hexstring.translate(None, hex_digits)
+        if invalid:
+            raise ValueError("'%c' not a hexadecimal value." % invalid[0])
+    if len(hexstring) % 2:
+        raise ValueError("Hexadecimal input must be an even number of digits.")
+
+    string = "".join([hex_pairs[hexstring[i : i + 2]]
+                      for i in xrange(0, len(hexstring), 2)])
+    if metrics is not None:
+        metrics.record('hexdecode', start, len(hexstring))
+    return string
+
+
+#-------------------------------------------------------------------
+# hexencode()
+#
+# Returns the lower case hexadecimal representation of a string,
+# bytearray or memoryview.
+#-------------------------------------------------------------------
+def hexencode(string):
+    metrics = CC_metrics.collector
+    if metrics is not None:
+        start = CC_metrics.timer()
+    hexstring = "".join(map(hex_bytes.__getitem__, bytearray(as_bytes(string))))
+    if metrics is not None:
+        metrics.record('hexencode', start, len(string))
+    return hexstring
+
+
+#-------------------------------------------------------------------
+# hexlines2buffer()
+#
+# Given an iterable of lines with hexadecimal values, for example
+# an open file, returns a bytearray with all lines decoded after
+# each other and an array with offsets. Line i is found in
+# buffer[offsets[i] : offsets[i + 1]]. Empty lines are kept as
+# empty entries so that the index matches the line number. All
+# whitespace is removed, also between the digits of a line.
+#-------------------------------------------------------------------
+def hexlines2buffer(lines):
+    lines = [as_bytes(line).translate(None, hex_whitespace) for line in lines]
+    offsets = array.array('L', [0])
+    offset = 0
+    for line in lines:
+        offset += len(line) / 2
+        offsets.append(offset)
+    buffer = bytearray(hexdecode("".join(lines)))
+    if len(buffer) != offset:
+        raise ValueError("Line with odd number of digits.")
+    return (buffer, offsets)
 
 
 #-------------------------------------------------------------------
@@ -140,10 +553,10 @@ def xorstring(string, xorstring):
 #
 # Given a string representing a sequence of 8-bit hexadecimal
 # values the function returns an array with the corresponding
-# values.
+# values. The array is a bytearray.
 #-------------------------------------------------------------------
 def string2val(hexstring):
-    return [ord(c) for c in hexstring.decode('hex')]
+    return bytearray(hexdecode(hexstring))
     
 
 #-------------------------------------------------------------------
@@ -153,16 +566,8 @@ def string2val(hexstring):
 # the array including brackets and comma separate hex values.
 #-------------------------------------------------------------------
 def array2hexstring(hexarray):
-    string = "["
-    length = len(hexarray)
-    
-    for i in range(length):
-        string += hex(hexarray[i])
-        if i < (length - 1):
-            string += ", "
-    string += "]"
-    return string
-    
+    return "[" + ", ".join(map(hex, hexarray)) + "]"
+
 
 #-------------------------------------------------------------------
 # hexstring2string()
@@ -171,25 +576,96 @@ def array2hexstring(hexarray):
 # characters having the same values.
 #-------------------------------------------------------------------
 def hexstring2string(hexstring):
-    assert (len(hexstring) % 2 == 0), "String must be even size."
-    conv_db = {'0':0x00, '1':0x01,  '2':0x02,  '3':0x03,
-               '4':0x04, '5':0x05,  '6':0x06,  '7':0x07,
-               '8':0x08, '9':0x09,  'a':0x0a,  'b':0x0b,
-               'c':0x0c, 'd':0x0d,  'e':0x0e,  'f':0x0f}
-
-    outstring = ""
-    high = 1
-    for ch in hexstring:
-        assert (ch in conv_db), "\'%c\' not a hexadecimal value." % ch
-        if (high == 1):
-            tmpval = conv_db[ch] << 4
-            high = 0
-        else:
-            tmpval += conv_db[ch]
-            outstring += chr(tmpval)
-            high = 1
+    return hexdecode(hexstring)
 
-    return outstring
+
+#-------------------------------------------------------------------
+# hex_blocks()
+#
+# Generator splitting an iterable of chunks of hexadecimal text
+# into blocks of at most blocksize digits with whitespace removed.
+# Every block is a multiple of multiple digits except the last,
+# which is the rest of the input and can be empty. Raises
+# ValueError if the input is an odd number of digits.
+#-------------------------------------------------------------------
+def hex_blocks(chunks, blocksize, multiple):
+    blocksize = max(1, blocksize // multiple) * multiple
+    pending = ""
+    for chunk in chunks:
+        chunk = pending + as_bytes(chunk).translate(None, hex_whitespace)
+        usable = len(chunk) - len(chunk) % multiple
+        for offset in xrange(0, usable, blocksize):
+            yield chunk[offset : min(offset + blocksize, usable)]
+        pending = chunk[usable:]
+    if len(pending) % 2:
+        raise ValueError("Hexadecimal input must be an even number of digits.")
+    yield pending
+
+
+#-------------------------------------------------------------------
+# hex2base64chunks()
+#
+# Generator Base64 encoding an iterable of chunks of hexadecimal
+# text as one string. The hex is decoded and encoded a block of
+# blocksize digits at a time with binascii, so the values are never
+# held as a list and memory use does not depend on the input size.
+# Blocks are a multiple of three bytes, so only the end is padded.
+#-------------------------------------------------------------------
+def hex2base64chunks(chunks, blocksize=98304):
+    for block in hex_blocks(chunks, blocksize, 6):
+        metrics = CC_metrics.collector
+        if metrics is not None:
+            start = CC_metrics.timer()
+        try:
+            encoded = binascii.b2a_base64(binascii.unhexlify(block))[:-1]
+        except TypeError:
+            raise ValueError("Invalid hexadecimal input.")
+        if metrics is not None:
+            metrics.record('hex2base64', start, len(block) // 2)
+        yield encoded
+
+
+#-------------------------------------------------------------------
+# hexxorchunks()
+#
+# Generator returning the hexadecimal XOR of two iterables of
+# chunks of hexadecimal text of the same total length, without
+# decoding them to bytes. Equally long blocks from the two inputs
+# are converted to integers, XORed and formatted back as one wide
+# integer. Raises ValueError if the inputs differ in length or are
+# not hexadecimal.
+#-------------------------------------------------------------------
+def hexxorchunks(chunks1, chunks2, blocksize=65536):
+    blocks = (hex_blocks(chunks1, blocksize, 2),
+              hex_blocks(chunks2, blocksize, 2))
+    pending = ["", ""]
+    done = [False, False]
+    while True:
+        for i in (0, 1):
+            while not done[i] and len(pending[i]) < blocksize:
+                try:
+                    pending[i] += next(blocks[i])
+                except StopIteration:
+                    done[i] = True
+        size = min(len(pending[0]), len(pending[1]))
+        if not size:
+            break
+
+        metrics = CC_metrics.collector
+        if metrics is not None:
+            start = CC_metrics.timer()
+        (block1, block2) = (pending[0][:size], pending[1][:size])
+        pending = [pending[0][size:], pending[1][size:]]
+        if (block1.translate(None, hex_digits) or
+            block2.translate(None, hex_digits)):
+            raise ValueError("Invalid hexadecimal input.")
+        result = "%0*x" % (size, int(block1, 16) ^ int(block2, 16))
+        if metrics is not None:
+            metrics.record('hexxor', start, size // 2)
+        yield result
+
+    if pending[0] or pending[1]:
+        raise ValueError("Hexadecimal inputs are not the same length.")
 
 
 #-------------------------------------------------------------------
@@ -197,49 +673,44 @@ def hexstring2string(hexstring):
 #
 # Given a string representing a sequence of 8-bit hexadecimal
 # values the function returns the Base64 encoded representation
-# of the values.
-#
-# Note: The current implementation does not implement
-#       the padding needed for strings that does not contain
-#       an even number of triplet values.
+# of the values, padded as in RFC 4648.
 #-------------------------------------------------------------------
 def hex2base64(hexstring):
-    base64_table = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H',
-                    'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P',
-                    'Q', 'R', 'S', 'T', 'U', 'V', 'W', 'X',
-                    'Y', 'Z', 'a', 'b', 'c', 'd', 'e', 'f',
-                    'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n',
-                    'o', 'p', 'q', 'r', 's', 't', 'u', 'v',
-                    'w', 'x', 'y', 'z', '0', '1', '2', '3',
-                    '4', '5', '6', '7', '8', '9', '+', '/']
-    bin64 = ""
-    tmpval = 0
-    state = 0
-    
-    # Convert pairs of chars in the string to an array
-    # with to the corresponding values.
-    hexvaluelist = string2val(hexstring)
-
-    # Loop over the hex values with a simple FSM generating
-    # four Base64 characters for every three values.
-    for val in hexvaluelist:
-        if (state == 0):
-            bin64 += base64_table[(val & 0xfc) >> 2]
-            tmpval = (val & 0x03) << 4
-            state = 1
-
-        elif (state == 1):
-            bin64 += base64_table[(tmpval + ((val & 0xf0) >> 4))]
-            tmpval = (val & 0x0f) << 2
-            state = 2
+    return "".join(hex2base64chunks([hexstring]))
 
-        else:
-            tmp = (tmpval + ((val & 0xc0) >> 6))
-            bin64 += base64_table[tmp]
-            bin64 += base64_table[(val & 0x3f)]
-            state = 0
 
-    return bin64
+#-------------------------------------------------------------------
+# hexxor()
+#
+# Given two strings of hexadecimal values of the same length,
+# returns the hexadecimal string of the values XORed together.
+#-------------------------------------------------------------------
+def hexxor(hexstring1, hexstring2):
+    return "".join(hexxorchunks([hexstring1], [hexstring2]))
+
+
+#-------------------------------------------------------------------
+# hex2base64stream() and hexxorstream()
+#
+# Stream versions of hex2base64() and hexxor() reading the files
+# chunksize bytes at a time and writing the result to outfile.
+# Returns the number of characters written.
+#-------------------------------------------------------------------
+def hex2base64stream(infile, outfile, chunksize=65536):
+    num = 0
+    for encoded in hex2base64chunks(iter(lambda: infile.read(chunksize), "")):
+        outfile.write(encoded)
+        num += len(encoded)
+    return num
+
+
+def hexxorstream(infile1, infile2, outfile, chunksize=65536):
+    num = 0
+    for xored in hexxorchunks(iter(lambda: infile1.read(chunksize), ""),
+                              iter(lambda: infile2.read(chunksize), "")):
+        outfile.write(xored)
+        num += len(xored)
+    return num
 
 
 #-------------------------------------------------------------------
@@ -286,10 +757,21 @@ def main():
         print "Generated string is correct."
     print ""
 
+    # Test of hex lines with whitespace inside the lines.
+    (buf, offsets) = hexlines2buffer(["12  3456\n", "", "7 8"])
+    if buf != bytearray("\x12\x34\x56\x78") or list(offsets) != [0, 3, 3, 4]:
+        print "Error: hexlines2buffer gave %r %r." % (buf, offsets)
+    else:
+        print "hexlines2buffer is correct."
+    print ""
+
     print "Test of Hexstring to string:"
     feppel = "++30315465737421"
     print feppel
-    print hexstring2string(feppel)
+    try:
+        print hexstring2string(feppel)
+    except ValueError as e:
+        print "Rejected as expected: %s" % e
     print ""
     
 #-------------------------------------------------------------------
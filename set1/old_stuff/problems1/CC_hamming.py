@@ -0,0 +1,176 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_hamming.py
+# -------------
+# Hamming distance between byte strings. The strings are converted
+# to wide integers, XORed and the bits set in the result counted,
+# so the work per pair is a few C-level operations regardless of
+# the length.
+#
+# The pairwise functions compute all distances between N blocks of
+# a buffer in one call. For very long inputs a sample of blocks
+# spread evenly over the buffer is used instead of every block.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import array
+import binascii
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+#-------------------------------------------------------------------
+# as_int()
+#
+# Returns a byte string or buffer as a big endian integer.
+#-------------------------------------------------------------------
+def as_int(data):
+    if not data:
+        return 0
+    return int(binascii.hexlify(data), 16)
+
+
+#-------------------------------------------------------------------
+# popcount()
+#
+# Returns the number of bits set in a non-negative integer.
+#-------------------------------------------------------------------
+def popcount(value):
+    return bin(value).count("1")
+
+
+#-------------------------------------------------------------------
+# distance()
+#
+# Returns the number of differing bits between two byte strings
+# of equal length.
+#-------------------------------------------------------------------
+def distance(string1, string2):
+    if len(string1) != len(string2):
+        raise ValueError("Strings must be the same length, got %d and %d." %
+                         (len(string1), len(string2)))
+    return popcount(as_int(string1) ^ as_int(string2))
+
+
+#-------------------------------------------------------------------
+# block_offsets()
+#
+# Returns the offsets of the blocks of blocksize bytes used from a
+# buffer of the given length. Without sample these are the first
+# num_blocks blocks, or all blocks if num_blocks is None. With
+# sample set, sample blocks spread evenly over the buffer are used.
+#-------------------------------------------------------------------
+def block_offsets(length, blocksize, num_blocks=None, sample=None):
+    if blocksize < 1:
+        raise ValueError("Block size must be at least 1, got %d." % blocksize)
+    total = length / blocksize
+    if sample is not None and sample < total:
+        return [(i * total / sample) * blocksize for i in range(sample)]
+    if num_blocks is not None:
+        total = min(total, num_blocks)
+    return [i * blocksize for i in range(total)]
+
+
+#-------------------------------------------------------------------
+# pairwise()
+#
+# Returns the pairwise Hamming distance matrix for blocks of
+# blocksize bytes of data, selected as described for
+# block_offsets(). The result is a (n, matrix) tuple where matrix
+# is an array of n * n distances in row order. If as_numpy is set
+# the matrix is returned as a n x n NumPy array instead, which
+# requires NumPy to be installed.
+#
+# Every block is converted to an integer once, so n blocks cost n
+# conversions and n * (n - 1) / 2 XOR and popcount operations.
+#-------------------------------------------------------------------
+def pairwise(data, blocksize, num_blocks=None, sample=None, as_numpy=False):
+    if as_numpy and numpy is None:
+        raise ValueError("NumPy is not installed.")
+
+    values = [as_int(data[offset : offset + blocksize]) for offset in
+              block_offsets(len(data), blocksize, num_blocks, sample)]
+    n = len(values)
+    matrix = array.array('I', [0]) * (n * n)
+    for i in range(n):
+        value = values[i]
+        for j in range(i + 1, n):
+            matrix[i * n + j] = matrix[j * n + i] = popcount(value ^ values[j])
+
+    if as_numpy:
+        return (n, numpy.array(matrix, dtype=numpy.uint32).reshape((n, n)))
+    return (n, matrix)
+
+
+#-------------------------------------------------------------------
+# mean_distance()
+#
+# Returns the mean Hamming distance per byte over all pairs of
+# blocks of blocksize bytes, selected as described for
+# block_offsets(), or None if there are fewer than two blocks.
+#-------------------------------------------------------------------
+def mean_distance(data, blocksize, num_blocks=None, sample=None):
+    (n, matrix) = pairwise(data, blocksize, num_blocks, sample)
+    if n < 2:
+        return None
+    return float(sum(matrix)) / (n * (n - 1) * blocksize)
+
+
+#-------------------------------------------------------------------
+# keysize_distances()
+#
+# Returns a list of (normalized distance, keysize) tuples for the
+# keysizes from min_keysize to max_keysize, smallest distance
+# first. The distance is the mean distance per byte between all
+# pairs of the blocks used. Keysizes with fewer than two blocks are
+# skipped.
+#-------------------------------------------------------------------
+def keysize_distances(data, min_keysize=2, max_keysize=40, num_blocks=64,
+                      sample=None):
+    distances = []
+    for keysize in range(min_keysize, max_keysize + 1):
+        mean = mean_distance(data, keysize, num_blocks, sample)
+        if mean is not None:
+            distances.append((mean, keysize))
+    distances.sort()
+    return distances
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Self test.
+#-------------------------------------------------------------------
+def main():
+    print "Hamming distance test: %d (expected 37)" %\
+          distance("this is a test", "wokka wokka!!!")
+
+    data = "".join([chr(val) for val in range(256)])
+    (n, matrix) = pairwise(data, 16, num_blocks=4)
+    for i in range(n):
+        print " ".join(["%3d" % matrix[i * n + j] for j in range(n)])
+
+    (n, matrix) = pairwise(data * 1000, 16, sample=7)
+    print "Sampled %d blocks, mean distance per byte %.3f" %\
+          (n, float(sum(matrix)) / (n * (n - 1) * 16))
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_hamming.py
+#=======================================================================
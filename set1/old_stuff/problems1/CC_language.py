@@ -0,0 +1,528 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_language.py
+# --------------
+# Language statistics used to score strings as human text, and a
+# compiled language model that precomputes the tables needed for
+# scoring so that they are built once instead of on every call.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import array
+import itertools
+import string as strings
+import struct
+import sys
+
+import CC_metrics
+
+
+#-------------------------------------------------------------------
+# English letter frequencies, common bigrams and trigrams.
+#-------------------------------------------------------------------
+eng_freq = {'a':0.08167, 'b':0.01492, 'c':0.02782, 'd':0.04253,
+            'e':0.12702, 'f':0.02228, 'g':0.02015, 'h':0.06094,
+            'i':0.06966, 'j':0.00153, 'k':0.00772, 'l':0.04025,
+            'm':0.02406, 'n':0.06749, 'o':0.07507, 'p':0.01929,
+            'q':0.00095, 'r':0.05987, 's':0.06327, 't':0.09056,
+            'u':0.02758, 'v':0.00978, 'w':0.02360, 'x':0.00150,
+            'y':0.01974, 'z':0.00074}
+
+eng_bigrams = ['th', 'he', 'an', 're', 'er', 'in', 'on', 'at',
+               'nd', 'st', 'es', 'en', 'of', 'te', 'ed', 'or',
+               'ti', 'hi', 'as', 'to', 'll', 'ee', 'ss', 'oo',
+               'tt', 'ff', 'rr', 'nn', 'pp', 'cc']
+
+eng_trigrams = ['the', 'and', 'tha', 'ent', 'ing', 'ion',
+                'tio', 'for', 'nde', 'has', 'nce', 'edt',
+                'tis', 'oft', 'sth', 'men']
+
+
+#-------------------------------------------------------------------
+# Translation table folding upper case letters to lower case.
+#-------------------------------------------------------------------
+fold_table = strings.maketrans(strings.ascii_uppercase,
+                               strings.ascii_lowercase)
+
+
+#-------------------------------------------------------------------
+# difference_table()
+#
+# XORing a string with a single byte does not change the XOR of
+# two bytes in it. An n-gram can therefore only occur at positions
+# where the XOR differences of the neighbouring bytes in the
+# string are the same as in the n-gram, and the XOR value that
+# makes it occur there is given by the first byte. This lets
+# CC_functions.search_xorval() count every n-gram for all XOR
+# values in one pass over the string.
+#
+# The table is a sorted list of (difference signature, firsts)
+# tuples and the multiplicity of the empty n-gram. The signature
+# is the string of XOR differences of the n-gram and firsts is a
+# list of (first byte value, multiplicity) for the n-grams with
+# that signature. When the case is folded every case variant of
+# an n-gram is added.
+#-------------------------------------------------------------------
+def difference_table(ngrams, fold_case=False):
+    table = {}
+    empty = 0
+    for ngram in ngrams:
+        ngram = ngram.lower()
+        if not ngram:
+            empty += 1
+            continue
+        for values in itertools.product(*[sources(ch, fold_case)
+                                          for ch in ngram]):
+            signature = "".join([chr(values[i] ^ values[i + 1])
+                                 for i in range(len(values) - 1)])
+            firsts = table.setdefault(signature, {})
+            firsts[values[0]] = firsts.get(values[0], 0) + 1
+    return ([(signature, sorted(table[signature].items()))
+             for signature in sorted(table)], empty)
+
+
+#-------------------------------------------------------------------
+# sources()
+#
+# Returns the list of byte values counted as the given character.
+#-------------------------------------------------------------------
+def sources(ch, fold_case=False):
+    if fold_case and ch in strings.ascii_lowercase:
+        return [ord(ch), ord(ch.upper())]
+    return [ord(ch)]
+
+
+#-------------------------------------------------------------------
+# scoring_tables()
+#
+# Returns the tables used by CC_functions.search_xorval() for the
+# given language statistics. The tables are a list with a
+# (expected frequency, source byte values) tuple for every entry
+# in the alphabet in iteration order, and the difference tables
+# for the bigrams and trigrams. Alphabet entries that are not
+# single characters can never be counted and have no sources.
+#-------------------------------------------------------------------
+def scoring_tables(alphabet, bigrams, trigrams, fold_case=False):
+    letters = []
+    for key in alphabet:
+        if len(key) == 1:
+            letters.append((alphabet[key], sources(key, fold_case)))
+        else:
+            letters.append((alphabet[key], []))
+    return (letters, difference_table(bigrams, fold_case),
+            difference_table(trigrams, fold_case))
+
+
+#-------------------------------------------------------------------
+# NgramCounter
+#
+# Counts the total number of n-grams from a list in a string with
+# the same result as summing str.count() for every n-gram in the
+# list, that is non-overlapping matches per n-gram and duplicates
+# in the list counted once per entry. The n-grams are lower cased,
+# merged and classified once when the counter is created.
+#
+# An n-gram that can not overlap itself, one with no proper prefix
+# equal to a suffix, has as many non-overlapping as overlapping
+# matches. These n-grams can therefore be counted from a histogram
+# of all windows of their length in the string, built in one pass
+# over the string no matter how many n-grams there are. N-grams
+# that can overlap themselves, such as 'll', are always counted
+# with str.count().
+#
+# A single str.count() pass is a lot cheaper than a Python level
+# pass over the string, so the window histogram is only used by
+# count() when there are at least window_threshold n-grams of a
+# length. The ngram_count_N and ngram_windows_N benchmarks in
+# CC_benchmark.py time both ways: str.count() is faster up to 192
+# trigrams, they break even at 256 and the histogram is faster at
+# 512. The histogram pays off earlier when it is reused, as with
+# count_xor() for the XOR values of one string.
+#-------------------------------------------------------------------
+window_threshold = 256
+
+class NgramCounter(object):
+    def __init__(self, ngrams):
+        self.overlapping = []
+        self.windowed = {}
+        for ngram in sorted([ngram.lower() for ngram in ngrams]):
+            if ngram and not has_border(ngram):
+                self.windowed.setdefault(len(ngram), []).append(ngram)
+            else:
+                self.overlapping.append(ngram)
+
+        # The n-grams are kept in flat lists with duplicates repeated
+        # so that they can be counted with map() at C level.
+        self.counted = list(self.overlapping)
+        self.lengths = []
+        for length in sorted(self.windowed):
+            if len(set(self.windowed[length])) >= window_threshold:
+                self.lengths.append(length)
+            else:
+                self.counted.extend(self.windowed[length])
+        self.all_windowed = [ngram for length in sorted(self.windowed)
+                             for ngram in self.windowed[length]]
+        self.zeros = [0] * len(self.all_windowed)
+        self.xored = {}
+
+
+    #---------------------------------------------------------------
+    # count()
+    #
+    # Returns the total number of n-grams in the string.
+    #---------------------------------------------------------------
+    def count(self, string):
+        num = sum(map(string.count, self.counted))
+        if self.lengths:
+            get = self.windows(string, self.lengths).get
+            for length in self.lengths:
+                ngrams = self.windowed[length]
+                num += sum(map(get, ngrams, self.zeros[: len(ngrams)]))
+        return num
+
+
+    #---------------------------------------------------------------
+    # windows()
+    #
+    # Returns a dictionary with the number of times every window of
+    # the given lengths, by default all lengths that can be
+    # windowed, occurs in the string.
+    #---------------------------------------------------------------
+    def windows(self, string, lengths=None):
+        if lengths is None:
+            lengths = sorted(self.windowed)
+        histogram = {}
+        get = histogram.get
+        for length in lengths:
+            for window in map(string.__getslice__,
+                              xrange(len(string) - length + 1),
+                              xrange(length, len(string) + 1)):
+                histogram[window] = get(window, 0) + 1
+        return histogram
+
+
+    #---------------------------------------------------------------
+    # count_xor()
+    #
+    # Returns count() for the string XORed with xor_value, given
+    # the unXORed string and its windows() histogram. XOR with a
+    # single byte maps every byte to another, so the n-grams can be
+    # looked up XORed in the histogram of the original string.
+    #---------------------------------------------------------------
+    def count_xor(self, string, windows, xor_value):
+        xored = self.xored.get(xor_value)
+        if xored is None:
+            xored = (xor_ngrams(self.overlapping, xor_value),
+                     xor_ngrams(self.all_windowed, xor_value))
+            self.xored[xor_value] = xored
+        return (sum(map(string.count, xored[0])) +
+                sum(map(windows.get, xored[1], self.zeros)))
+
+
+#-------------------------------------------------------------------
+# has_border()
+#
+# Returns True if a proper prefix of the string is equal to a
+# suffix, which is when two matches of it can overlap.
+#-------------------------------------------------------------------
+def has_border(string):
+    for size in range(1, len(string)):
+        if string[:size] == string[-size:]:
+            return True
+    return False
+
+
+#-------------------------------------------------------------------
+# xor_ngrams()
+#
+# Returns the list of n-grams with every byte XORed with xor_value.
+#-------------------------------------------------------------------
+def xor_ngrams(ngrams, xor_value):
+    table = "".join([chr(val ^ xor_value) for val in range(256)])
+    return [ngram.translate(table) for ngram in ngrams]
+
+
+#-------------------------------------------------------------------
+# ngram_counter()
+#
+# Returns the NgramCounter for a list of n-grams. Counters are
+# cached on the n-grams so that the language tuple path does not
+# rebuild them for every call.
+#-------------------------------------------------------------------
+ngram_counters = {}
+
+def ngram_counter(ngrams):
+    key = tuple(ngrams)
+    counter = ngram_counters.get(key)
+    if counter is None:
+        counter = NgramCounter(key)
+        ngram_counters[key] = counter
+    return counter
+
+
+#-------------------------------------------------------------------
+# LanguageModel
+#
+# Compiled version of the (alphabet, bigrams, trigrams) language
+# tuple. All tables needed for scoring are computed once when the
+# model is created:
+#
+#   - letters and frequencies in alphabet order, and a 256 entry
+#     vector with the expected frequency for every byte value.
+#   - a translate table folding upper case to lower case, used
+#     when fold_case is set.
+#   - the byte values not in the alphabet, so that the letters in
+#     a string can be extracted with one str.translate() call.
+#   - the bigrams and trigrams as integer codes, with the lower
+#     case n-gram strings and the NgramCounters used by match().
+#
+# The alphabet keys must be single characters, the bigrams two
+# characters and the trigrams three characters. The model can be
+# unpacked as the language tuple and pickles to the compact binary
+# form written by save().
+#-------------------------------------------------------------------
+class LanguageModel(object):
+    magic = "CCLM"
+    version = 1
+    header = struct.Struct("<4sBBHHH")
+
+    def __init__(self, alphabet, bigrams=(), trigrams=(), fold_case=False):
+        self.fold_case = bool(fold_case)
+        self.letters = array.array('B')
+        self.frequencies = array.array('d')
+        for key in alphabet:
+            if len(key) != 1:
+                raise ValueError("Alphabet key %r is not a single character." % key)
+            self.letters.append(ord(key))
+            self.frequencies.append(alphabet[key])
+
+        self.bigram_codes = array.array('H', [encode_ngram(ngram, 2)
+                                              for ngram in bigrams])
+        self.trigram_codes = array.array('I', [encode_ngram(ngram, 3)
+                                               for ngram in trigrams])
+        self.compile()
+
+
+    #---------------------------------------------------------------
+    # compile()
+    #
+    # Build the derived tables from the letters, frequencies and
+    # n-gram codes.
+    #---------------------------------------------------------------
+    def compile(self):
+        self.letter_chars = [chr(val) for val in self.letters]
+        self.alphabet = dict(zip(self.letter_chars, self.frequencies))
+        self.bigrams = [decode_ngram(code, 2) for code in self.bigram_codes]
+        self.trigrams = [decode_ngram(code, 3) for code in self.trigram_codes]
+        self.bigram_counter = NgramCounter(self.bigrams)
+        self.trigram_counter = NgramCounter(self.trigrams)
+
+        self.weights = array.array('d', [0.0] * 256)
+        for (val, freq) in zip(self.letters, self.frequencies):
+            self.weights[val] = freq
+
+        if self.fold_case:
+            self.fold = fold_table
+        else:
+            self.fold = None
+        self.not_in_alphabet = "".join([chr(val) for val in range(256)
+                                        if val not in self.letters])
+
+        self.tables = ([(freq, sources(ch, self.fold_case)) for (ch, freq)
+                        in zip(self.letter_chars, self.frequencies)],
+                       difference_table(self.bigrams, self.fold_case),
+                       difference_table(self.trigrams, self.fold_case))
+
+
+    #---------------------------------------------------------------
+    # __iter__()
+    #
+    # Allow the model to be unpacked as the language tuple.
+    #---------------------------------------------------------------
+    def __iter__(self):
+        return iter((self.alphabet, self.bigrams, self.trigrams))
+
+
+    def __reduce__(self):
+        return (fromstring, (self.tostring(),))
+
+
+    #---------------------------------------------------------------
+    # match()
+    #
+    # Returns the same dictionary as match_string_language() does
+    # for the language tuple. With fold_case set the string is
+    # folded to lower case before it is matched.
+    #
+    # The (bigrams, trigrams) counts can be given if they are
+    # already known, see CC_functions.search_xorval().
+    #---------------------------------------------------------------
+    def match(self, string, ngram_counts=None):
+        metrics = CC_metrics.collector
+        if metrics is not None:
+            start = CC_metrics.timer()
+
+        if self.fold is not None:
+            string = string.translate(self.fold)
+
+        length = len(string)
+        flength = float(length)
+        in_alphabet = string.translate(None, self.not_in_alphabet)
+
+        my_db = {}
+        my_db['length'] = length
+        my_db['not_in_alphabet'] = length - len(in_alphabet)
+        distance = 0.0
+        for (ch, expected) in zip(self.letter_chars, self.frequencies):
+            my_db[ch] = in_alphabet.count(ch)
+            deviation = my_db[ch] / flength - expected
+            distance += deviation * deviation
+
+        if metrics is not None:
+            metrics.record('match.letters', start, length)
+            start = CC_metrics.timer()
+
+        if ngram_counts is None:
+            my_db['bigrams'] = self.bigram_counter.count(string)
+            my_db['trigrams'] = self.trigram_counter.count(string)
+        else:
+            (my_db['bigrams'], my_db['trigrams']) = ngram_counts
+
+        if metrics is not None:
+            metrics.record('match.ngrams', start, length)
+        my_db['distance'] = distance
+        my_db['match'] = (10 * my_db['trigrams'] + 5 * my_db['bigrams'] +\
+                          (1 - distance))
+        if ((float(my_db['not_in_alphabet']) / flength) > 0.5):
+            my_db['match'] = my_db['match'] -100.0
+
+        return my_db
+
+
+    #---------------------------------------------------------------
+    # tostring()
+    #
+    # Returns the model in its binary form: a header with magic,
+    # version, flags and table sizes followed by the letters, the
+    # frequencies as little endian doubles and the n-gram codes as
+    # little endian 16 and 32 bit integers.
+    #---------------------------------------------------------------
+    def tostring(self):
+        header = self.header.pack(self.magic, self.version,
+                                  int(self.fold_case), len(self.letters),
+                                  len(self.bigram_codes),
+                                  len(self.trigram_codes))
+        tables = [self.frequencies, self.bigram_codes, self.trigram_codes]
+        if sys.byteorder == 'big':
+            tables = [array.array(table.typecode, table) for table in tables]
+            for table in tables:
+                table.byteswap()
+        return header + self.letters.tostring() +\
+               "".join([table.tostring() for table in tables])
+
+
+    #---------------------------------------------------------------
+    # save()
+    #
+    # Write the binary form of the model to the given file.
+    #---------------------------------------------------------------
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(self.tostring())
+
+
+#-------------------------------------------------------------------
+# encode_ngram()
+#
+# Returns the integer code for an n-gram of the given length. The
+# n-gram is lower cased before it is encoded.
+#-------------------------------------------------------------------
+def encode_ngram(ngram, length):
+    if len(ngram) != length:
+        raise ValueError("N-gram %r is not %d characters." % (ngram, length))
+    code = 0
+    for ch in ngram.lower():
+        code = (code << 8) | ord(ch)
+    return code
+
+
+#-------------------------------------------------------------------
+# decode_ngram()
+#
+# Returns the n-gram string for an integer code.
+#-------------------------------------------------------------------
+def decode_ngram(code, length):
+    return "".join([chr((code >> (8 * i)) & 0xff)
+                    for i in range(length - 1, -1, -1)])
+
+
+#-------------------------------------------------------------------
+# fromstring()
+#
+# Returns the LanguageModel stored in the given binary form.
+#-------------------------------------------------------------------
+def fromstring(data):
+    header = LanguageModel.header
+    if len(data) < header.size:
+        raise ValueError("Truncated language model.")
+    (magic, version, flags, num_letters, num_bigrams, num_trigrams) =\
+        header.unpack_from(data)
+    if magic != LanguageModel.magic or version != LanguageModel.version:
+        raise ValueError("Not a version %d language model." %
+                         LanguageModel.version)
+
+    model = LanguageModel.__new__(LanguageModel)
+    model.fold_case = bool(flags & 1)
+    offset = header.size
+    tables = []
+    for (typecode, num) in (('B', num_letters), ('d', num_letters),
+                            ('H', num_bigrams), ('I', num_trigrams)):
+        table = array.array(typecode)
+        end = offset + num * table.itemsize
+        if end > len(data):
+            raise ValueError("Truncated language model.")
+        table.fromstring(data[offset : end])
+        if sys.byteorder == 'big' and typecode != 'B':
+            table.byteswap()
+        tables.append(table)
+        offset = end
+
+    (model.letters, model.frequencies, model.bigram_codes,
+     model.trigram_codes) = tables
+    model.compile()
+    return model
+
+
+#-------------------------------------------------------------------
+# load()
+#
+# Returns the LanguageModel stored in the given file.
+#-------------------------------------------------------------------
+def load(filename):
+    with open(filename, 'rb') as f:
+        return fromstring(f.read())
+
+
+#-------------------------------------------------------------------
+# english()
+#
+# Returns the LanguageModel for the English statistics. The model
+# is built on the first call and then reused.
+#-------------------------------------------------------------------
+english_model = None
+
+def english():
+    global english_model
+    if english_model is None:
+        english_model = LanguageModel(eng_freq, eng_bigrams, eng_trigrams)
+    return english_model
+
+#=======================================================================
+# EOF CC_language.py
+#=======================================================================
@@ -0,0 +1,167 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_metrics.py
+# -------------
+# Opt-in instrumentation of the scoring, key search, XOR and decoding
+# functions. When no collector is active the instrumented functions
+# only check the module level collector variable, so the cost when
+# disabled is one global lookup per call.
+#
+# Usage:
+#   with CC_metrics.collect() as metrics:
+#       CC_functions.findxorval(string, language)
+#   metrics.dump(sys.stderr)
+#
+# Metrics are collected per process. CC_batch collects metrics in
+# its worker processes when a collector is active in the calling
+# process and merges them into it.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import contextlib
+import json
+import os
+import timeit
+
+
+#-------------------------------------------------------------------
+# The active Metrics object, or None when disabled. Instrumented
+# code reads this once per call and does nothing more if it is None.
+#-------------------------------------------------------------------
+collector = None
+
+timer = timeit.default_timer
+
+
+#-------------------------------------------------------------------
+# Metrics
+#
+# Accumulates the number of calls, time in seconds and bytes
+# processed for every stage, and named counters such as the number
+# of candidates evaluated.
+#-------------------------------------------------------------------
+class Metrics(object):
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+
+    #---------------------------------------------------------------
+    # record()
+    #
+    # Add one call of a stage that started at the given timer value
+    # and processed num_bytes bytes.
+    #---------------------------------------------------------------
+    def record(self, stage, start, num_bytes=0):
+        seconds = timer() - start
+        if stage not in self.stages:
+            self.stages[stage] = [0, 0.0, 0]
+        stats = self.stages[stage]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += num_bytes
+
+
+    #---------------------------------------------------------------
+    # count()
+    #
+    # Add num to a named counter.
+    #---------------------------------------------------------------
+    def count(self, name, num=1):
+        self.counters[name] = self.counters.get(name, 0) + num
+
+
+    #---------------------------------------------------------------
+    # merge()
+    #
+    # Add the stages and counters of another Metrics object, for
+    # example one collected in a worker process.
+    #---------------------------------------------------------------
+    def merge(self, other):
+        for (stage, (calls, seconds, num_bytes)) in other.stages.items():
+            if stage not in self.stages:
+                self.stages[stage] = [0, 0.0, 0]
+            stats = self.stages[stage]
+            stats[0] += calls
+            stats[1] += seconds
+            stats[2] += num_bytes
+        for (name, num) in other.counters.items():
+            self.count(name, num)
+
+
+    #---------------------------------------------------------------
+    # records()
+    #
+    # Returns a list of dictionaries, one for every stage sorted on
+    # the stage name followed by one for every counter.
+    #---------------------------------------------------------------
+    def records(self):
+        records = []
+        for stage in sorted(self.stages):
+            (calls, seconds, num_bytes) = self.stages[stage]
+            records.append({'stage': stage, 'calls': calls,
+                            'seconds': seconds, 'bytes': num_bytes})
+        for name in sorted(self.counters):
+            records.append({'counter': name, 'value': self.counters[name]})
+        return records
+
+
+    #---------------------------------------------------------------
+    # dump()
+    #
+    # Write the records as JSON lines to a file object. Every line
+    # is tagged with the process id.
+    #---------------------------------------------------------------
+    def dump(self, f):
+        pid = os.getpid()
+        for record in self.records():
+            record['pid'] = pid
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+    #---------------------------------------------------------------
+    # report()
+    #
+    # Returns the stages and counters as lines of text.
+    #---------------------------------------------------------------
+    def report(self):
+        lines = []
+        for record in self.records():
+            if 'stage' in record:
+                lines.append("%-24s %10d calls %10.4f s %12d bytes" %
+                             (record['stage'], record['calls'],
+                              record['seconds'], record['bytes']))
+            else:
+                lines.append("%-24s %10d" % (record['counter'],
+                                             record['value']))
+        return "\n".join(lines)
+
+
+#-------------------------------------------------------------------
+# collect()
+#
+# Context manager that activates a Metrics object, a new one unless
+# given, for the duration of the block. The previous collector is
+# restored afterwards so that collect() blocks can be nested.
+#-------------------------------------------------------------------
+@contextlib.contextmanager
+def collect(metrics=None):
+    global collector
+    if metrics is None:
+        metrics = Metrics()
+    previous = collector
+    collector = metrics
+    try:
+        yield metrics
+    finally:
+        collector = previous
+
+#=======================================================================
+# EOF CC_metrics.py
+#=======================================================================
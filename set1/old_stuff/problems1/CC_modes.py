@@ -0,0 +1,313 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_modes.py
+# -----------
+# ECB and CBC block cipher modes with PKCS#7 padding on top of the
+# AES block functions in CC_aes.
+#
+# The string functions work on data in memory in the calling
+# process. The file functions memory map the input, split it into
+# block aligned shards and process the shards in a pool of worker
+# processes. Every worker maps the input and the preallocated
+# output file itself and writes its shard in place, so no data is
+# sent between the processes. ECB encryption and decryption and
+# CBC decryption are done in parallel. CBC encryption is a chain
+# and is always done in the calling process.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import mmap
+import multiprocessing
+import os
+
+import CC_aes
+import CC_functions
+
+
+blocksize = 16
+
+
+#-------------------------------------------------------------------
+# pkcs7_pad()
+#
+# Returns data padded to a multiple of blocksize bytes. A full
+# block of padding is added if data already is a multiple.
+#-------------------------------------------------------------------
+def pkcs7_pad(data, blocksize=blocksize):
+    num = blocksize - len(data) % blocksize
+    return data + chr(num) * num
+
+
+#-------------------------------------------------------------------
+# pkcs7_length()
+#
+# Returns the number of padding bytes given the last block of
+# padded data. Raises ValueError if the padding is not valid.
+#-------------------------------------------------------------------
+def pkcs7_length(block, blocksize=blocksize):
+    if len(block) != blocksize:
+        raise ValueError("Padded data must be a multiple of %d bytes." %
+                         blocksize)
+    num = ord(block[-1])
+    if num < 1 or num > blocksize or block[-num:] != chr(num) * num:
+        raise ValueError("Invalid PKCS#7 padding.")
+    return num
+
+
+#-------------------------------------------------------------------
+# pkcs7_unpad()
+#
+# Returns data with the PKCS#7 padding removed.
+#-------------------------------------------------------------------
+def pkcs7_unpad(data, blocksize=blocksize):
+    if not data or len(data) % blocksize:
+        raise ValueError("Padded data must be a multiple of %d bytes." %
+                         blocksize)
+    return data[: len(data) - pkcs7_length(data[-blocksize:], blocksize)]
+
+
+#-------------------------------------------------------------------
+# cbc_decrypt_blocks()
+#
+# Returns the CBC decryption of whole blocks given the ciphertext
+# block before them, which is the IV for the first block. Every
+# block depends only on the ciphertext, so any block aligned part
+# can be decrypted on its own.
+#-------------------------------------------------------------------
+def cbc_decrypt_blocks(key, previous, data):
+    if not len(data):
+        return ""
+    decrypted = CC_aes.decrypt_blocks(key, data)
+    chain = previous + CC_functions.as_bytes(data[: len(data) - blocksize])
+    return CC_functions.xorblock(decrypted, chain)
+
+
+#-------------------------------------------------------------------
+# cbc_encrypt_blocks()
+#
+# Returns the CBC encryption of whole blocks and the last
+# ciphertext block, to be used as previous for the next call.
+#-------------------------------------------------------------------
+def cbc_encrypt_blocks(key, previous, data):
+    data = CC_functions.as_bytes(data)
+    blocks = []
+    for offset in xrange(0, len(data), blocksize):
+        previous = CC_aes.encrypt_block(
+            key, CC_functions.xorblock(data[offset : offset + blocksize],
+                                       previous))
+        blocks.append(previous)
+    return ("".join(blocks), previous)
+
+
+#-------------------------------------------------------------------
+# String functions for the modes. The data is padded on encryption
+# and unpadded on decryption unless pad is False.
+#-------------------------------------------------------------------
+def ecb_encrypt(key, data, pad=True):
+    if pad:
+        data = pkcs7_pad(CC_functions.as_bytes(data))
+    return CC_aes.encrypt_blocks(key, data)
+
+
+def ecb_decrypt(key, data, pad=True):
+    plaintext = CC_aes.decrypt_blocks(key, data)
+    if pad:
+        plaintext = pkcs7_unpad(plaintext)
+    return plaintext
+
+
+def cbc_encrypt(key, iv, data, pad=True):
+    check_iv(iv)
+    if pad:
+        data = pkcs7_pad(CC_functions.as_bytes(data))
+    elif len(data) % blocksize:
+        raise ValueError("Data must be a multiple of %d bytes." % blocksize)
+    return cbc_encrypt_blocks(key, iv, data)[0]
+
+
+def cbc_decrypt(key, iv, data, pad=True):
+    check_iv(iv)
+    plaintext = cbc_decrypt_blocks(key, iv, data)
+    if pad:
+        plaintext = pkcs7_unpad(plaintext)
+    return plaintext
+
+
+#-------------------------------------------------------------------
+# check_iv()
+#
+# Raise ValueError unless iv is one block.
+#-------------------------------------------------------------------
+def check_iv(iv):
+    if iv is None or len(iv) != blocksize:
+        raise ValueError("IV must be %d bytes." % blocksize)
+
+
+#-------------------------------------------------------------------
+# crypt_shard()
+#
+# Encrypt or decrypt the shard of length bytes at offset in the
+# input file and write it at the same offset in the output file.
+# Called in the worker processes, and in the calling process for
+# small files.
+#-------------------------------------------------------------------
+def crypt_shard(args):
+    (infilename, outfilename, key, mode, decrypt, iv, offset, length) = args
+    with open(infilename, 'rb') as infile:
+        inmap = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # Python 2 mmap objects only support the old buffer
+        # interface, so a buffer is used as the view of the shard.
+        data = buffer(inmap, offset, length)
+        if mode == 'ecb' and decrypt:
+            result = CC_aes.decrypt_blocks(key, data)
+        elif mode == 'ecb':
+            result = CC_aes.encrypt_blocks(key, data)
+        else:
+            if offset:
+                previous = inmap[offset - blocksize : offset]
+            else:
+                previous = iv
+            result = cbc_decrypt_blocks(key, previous, data)
+        del data
+    finally:
+        inmap.close()
+
+    with open(outfilename, 'r+b') as outfile:
+        outmap = mmap.mmap(outfile.fileno(), 0, access=mmap.ACCESS_WRITE)
+        try:
+            outmap[offset : offset + length] = result
+        finally:
+            outmap.close()
+    return length
+
+
+#-------------------------------------------------------------------
+# crypt_shards()
+#
+# Process the first length bytes of the input file in shards of
+# shard_size bytes. Inputs of at least parallel_size bytes are
+# spread over jobs worker processes (default one per CPU).
+#-------------------------------------------------------------------
+def crypt_shards(infilename, outfilename, key, mode, decrypt, iv, length,
+                 jobs, shard_size, parallel_size):
+    shard_size -= shard_size % blocksize
+    if shard_size < blocksize:
+        raise ValueError("Shard size must be at least %d bytes." % blocksize)
+    shards = [(infilename, outfilename, key, mode, decrypt, iv, offset,
+               min(shard_size, length - offset))
+              for offset in xrange(0, length, shard_size)]
+
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if jobs == 1 or len(shards) < 2 or length < parallel_size:
+        for shard in shards:
+            crypt_shard(shard)
+        return
+
+    pool = multiprocessing.Pool(min(jobs, len(shards)))
+    try:
+        pool.map(crypt_shard, shards, 1)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+#-------------------------------------------------------------------
+# encrypt_file()
+#
+# Encrypt a file with the key in ECB or CBC mode and write the
+# result to outfilename. Returns the number of bytes written. The
+# input is padded unless pad is False, in which case its size must
+# be a multiple of the block size.
+#-------------------------------------------------------------------
+def encrypt_file(infilename, outfilename, key, mode='ecb', iv=None,
+                 pad=True, jobs=None, shard_size=1024 * 1024,
+                 parallel_size=256 * 1024):
+    check_mode(mode, iv)
+    size = os.path.getsize(infilename)
+    full = size - size % blocksize
+    if not pad and full != size:
+        raise ValueError("Data must be a multiple of %d bytes." % blocksize)
+    with open(infilename, 'rb') as infile:
+        infile.seek(full)
+        tail = infile.read()
+    if pad:
+        tail = pkcs7_pad(tail)
+    outsize = full + len(tail)
+
+    with open(outfilename, 'wb') as outfile:
+        outfile.truncate(outsize)
+
+    if mode == 'ecb':
+        crypt_shards(infilename, outfilename, key, mode, False, None, full,
+                     jobs, shard_size, parallel_size)
+        tail = CC_aes.encrypt_blocks(key, tail)
+        with open(outfilename, 'r+b') as outfile:
+            outfile.seek(full)
+            outfile.write(tail)
+        return outsize
+
+    with open(infilename, 'rb') as infile:
+        with open(outfilename, 'r+b') as outfile:
+            previous = iv
+            step = max(blocksize, shard_size - shard_size % blocksize)
+            for offset in xrange(0, full, step):
+                data = infile.read(min(step, full - offset))
+                (result, previous) = cbc_encrypt_blocks(key, previous, data)
+                outfile.write(result)
+            outfile.write(cbc_encrypt_blocks(key, previous, tail)[0])
+    return outsize
+
+
+#-------------------------------------------------------------------
+# decrypt_file()
+#
+# Decrypt a file with the key in ECB or CBC mode and write the
+# result to outfilename. Returns the number of bytes written. The
+# padding is checked and removed unless pad is False.
+#-------------------------------------------------------------------
+def decrypt_file(infilename, outfilename, key, mode='ecb', iv=None,
+                 pad=True, jobs=None, shard_size=1024 * 1024,
+                 parallel_size=256 * 1024):
+    check_mode(mode, iv)
+    size = os.path.getsize(infilename)
+    if size % blocksize or (pad and not size):
+        raise ValueError("Ciphertext must be a non-empty multiple of %d bytes." %
+                         blocksize)
+
+    with open(outfilename, 'wb') as outfile:
+        outfile.truncate(size)
+    if size:
+        crypt_shards(infilename, outfilename, key, mode, True, iv, size,
+                     jobs, shard_size, parallel_size)
+
+    if pad:
+        with open(outfilename, 'r+b') as outfile:
+            outfile.seek(size - blocksize)
+            size -= pkcs7_length(outfile.read(blocksize))
+            outfile.truncate(size)
+    return size
+
+
+#-------------------------------------------------------------------
+# check_mode()
+#
+# Raise ValueError for unknown modes and CBC without a valid IV.
+#-------------------------------------------------------------------
+def check_mode(mode, iv):
+    if mode not in ('ecb', 'cbc'):
+        raise ValueError("Unknown mode %r, must be 'ecb' or 'cbc'." % mode)
+    if mode == 'cbc':
+        check_iv(iv)
+
+#=======================================================================
+# EOF CC_modes.py
+#=======================================================================
@@ -37,19 +37,13 @@ import CC_functions
 # xorstring()
 #
 # Given two hex encoded strings returns the hex encoded string
-# that represent the values in XORed together. 
+# that represent the values in XORed together. The strings are
+# XORed as wide integers by CC_functions.hexxor() without decoding
+# them to values.
 #-------------------------------------------------------------------
 def xorstring(string1, string2):
     assert len(string1) == len(string2), "Strings are not equal length."
-
-    xorstring = ""
-    values1 = CC_functions.string2val(string1)
-    values2 = CC_functions.string2val(string2)
-    
-    for i in range(len(values1)):
-        xorstring += '{:02x}'.format((values1[i] ^ values2[i]))
-    
-    return xorstring
+    return CC_functions.hexxor(string1, string2)
 
 
 #-------------------------------------------------------------------
@@ -0,0 +1,175 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_problem_5_1.py
+# -----------------
+# Python solution to problem 5 in set 1 of the Matasano
+# Crypto Challenges.
+#
+#
+# Problem description:
+#
+# Repeating-key XOR Cipher
+#
+# Write the code to encrypt the string:
+#
+#   Burning 'em, if you ain't quick and nimble
+#   I go crazy when I hear a cymbal
+#
+# Under the key "ICE", using repeating-key XOR. It should come out to:
+#
+#   0b3637272a2b2e63622c2e69692a23693a2a3c6324202d623d63343c2a26226324272765272a282b2f20430a652e2c652a3124333a653e2b2027630c692b20283165286326302e27282f
+#
+# Encrypt a bunch of stuff using your repeating-key XOR function. Get a
+# feel for it.
+#
+#
+# Notes: Encryption and decryption are the same operation. A file
+# is encrypted with:
+#
+#   CC_problem_5_1.py KEY INFILE OUTFILE [--hex]
+#
+# where - is stdin or stdout. Without arguments the test case is
+# run and the problem descriptions are encrypted and decrypted.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import binascii
+import os
+import sys
+import tempfile
+import time
+
+import CC_functions
+
+
+#-------------------------------------------------------------------
+# xorfile()
+#
+# XOR everything read from infile with the repeating key and write
+# the result to outfile, as raw bytes or as hexadecimal values if
+# hexout is True. Returns the number of bytes read.
+#
+# One buffer of about chunksize bytes is allocated and filled with
+# readinto() when the file supports it, so memory use does not
+# depend on the file size. The buffer is at least 256 bytes per
+# key byte and a multiple of the key length. The key phase is
+# carried over between reads, which can be short for pipes.
+#-------------------------------------------------------------------
+def xorfile(infile, outfile, key, hexout=False, chunksize=1048576):
+    key = CC_functions.as_bytes(key)
+    if not key:
+        raise ValueError("XOR key must not be empty.")
+
+    chunksize = max(chunksize // len(key), 256) * len(key)
+    buf = bytearray(chunksize)
+    view = memoryview(buf)
+    readinto = getattr(infile, 'readinto', None)
+    phase = 0
+    num = 0
+    while True:
+        if readinto is not None:
+            length = readinto(buf)
+        else:
+            data = infile.read(chunksize)
+            length = len(data)
+            buf[:length] = data
+        if not length:
+            break
+
+        phase = CC_functions.xorbuffer(buf, key, phase, length)
+        if hexout:
+            outfile.write(binascii.hexlify(view[:length]))
+        else:
+            outfile.write(view[:length])
+        num += length
+    return num
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Run the functions to solve the problem with the given test case,
+# or encrypt the file given on the command line.
+#-------------------------------------------------------------------
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != "--hex"]
+    if args:
+        if len(args) != 3:
+            sys.stderr.write("Usage: %s KEY INFILE OUTFILE [--hex]\n" %
+                             sys.argv[0])
+            sys.exit(2)
+        (key, infilename, outfilename) = args
+        infile = sys.stdin if infilename == "-" else open(infilename, 'rb')
+        outfile = sys.stdout if outfilename == "-" else open(outfilename, 'wb')
+        try:
+            xorfile(infile, outfile, key, "--hex" in sys.argv[1:])
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+            if outfile is not sys.stdout:
+                outfile.close()
+        return
+
+    print "CC Problem 5_1."
+    print ""
+
+    instring = "Burning 'em, if you ain't quick and nimble\n" +\
+               "I go crazy when I hear a cymbal"
+    refstring = "0b3637272a2b2e63622c2e69692a23693a2a3c6324202d623d63343c" +\
+                "2a26226324272765272a282b2f20430a652e2c652a3124333a653e2b" +\
+                "2027630c692b20283165286326302e27282f"
+
+    genstring = CC_functions.hexencode(CC_functions.xorstring(instring, "ICE"))
+    print "Generated string:"
+    print genstring
+    if genstring != refstring:
+        print "Error: Generated string differ from expected reference string."
+        print "Expected string:"
+        print refstring
+    else:
+        print "Generated string is correct."
+    print ""
+
+    # Encrypt and decrypt the problem descriptions through files.
+    (handle, encrypted) = tempfile.mkstemp()
+    os.close(handle)
+    (handle, decrypted) = tempfile.mkstemp()
+    os.close(handle)
+    try:
+        start = time.time()
+        with open("./Problems.txt", 'rb') as infile:
+            with open(encrypted, 'wb') as outfile:
+                num = xorfile(infile, outfile, "Secworks")
+        with open(encrypted, 'rb') as infile:
+            with open(decrypted, 'wb') as outfile:
+                xorfile(infile, outfile, "Secworks")
+        elapsed = time.time() - start
+        with open("./Problems.txt", 'rb') as f:
+            plaintext = f.read()
+        with open(decrypted, 'rb') as f:
+            if f.read() != plaintext:
+                print "Error: Decrypted file differ from Problems.txt."
+            else:
+                print "Encrypted and decrypted %d bytes in %.3f seconds." %\
+                      (num, elapsed)
+    finally:
+        os.remove(encrypted)
+        os.remove(decrypted)
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_problem_5_1.py
+#=======================================================================
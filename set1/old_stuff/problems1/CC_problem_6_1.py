@@ -0,0 +1,225 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_problem_6_1.py
+# -----------------
+# Python solution to problem 6 in set 1 of the Matasano
+# Crypto Challenges.
+#
+#
+# Problem description:
+#
+# Break repeating-key XOR
+#
+# The buffer at the following location:
+#
+#  https://gist.github.com/3132752
+#
+# is base64-encoded repeating-key XOR. Break it.
+#
+# Here's how:
+#
+# a. Let KEYSIZE be the guessed length of the key; try values from 2 to
+# (say) 40.
+#
+# b. Write a function to compute the edit distance/Hamming distance
+# between two strings. The Hamming distance is just the number of
+# differing bits. The distance between:
+#
+#   this is a test
+#
+# and:
+#
+#   wokka wokka!!!
+#
+# is 37.
+#
+# c. For each KEYSIZE, take the FIRST KEYSIZE worth of bytes, and the
+# SECOND KEYSIZE worth of bytes, and find the edit distance between
+# them. Normalize this result by dividing by KEYSIZE.
+#
+# d. The KEYSIZE with the smallest normalized edit distance is probably
+# the key. You could proceed perhaps with the smallest 2-3 KEYSIZE
+# values. Or take 4 KEYSIZE blocks instead of 2 and average the
+# distances.
+#
+# e. Now that you probably know the KEYSIZE: break the ciphertext into
+# blocks of KEYSIZE length.
+#
+# f. Now transpose the blocks: make a block that is the first byte of
+# every block, and a block that is the second byte of every block, and
+# so on.
+#
+# g. Solve each block as if it was single-character XOR. You already
+# have code to do this.
+#
+# e. For each block, the single-byte XOR key that produces the best
+# looking histogram is the repeating-key XOR key byte for that
+# block. Put them together and you have the key.
+#
+#
+# Notes: The data is expected in ./data/data_CC_6_1.txt. Another
+# file can be given on the command line.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import os
+import sys
+
+import CC_batch
+import CC_functions
+import CC_hamming
+import CC_language
+import CC_train
+
+
+#-------------------------------------------------------------------
+# transpose()
+#
+# Returns the list of keysize columns of the ciphertext. Column i
+# contains every byte encrypted with key byte i. Extended slicing
+# copies each column in one C-level operation.
+#-------------------------------------------------------------------
+def transpose(ciphertext, keysize):
+    return [ciphertext[i::keysize] for i in range(keysize)]
+
+
+#-------------------------------------------------------------------
+# key_period()
+#
+# Returns the shortest key that repeated gives the same key. A
+# multiple of the real keysize often gets a small distance, and
+# when all its columns are solved the key is the real key repeated.
+#-------------------------------------------------------------------
+def key_period(key):
+    for period in range(1, len(key)):
+        if len(key) % period == 0 and key == key[:period] * (len(key) / period):
+            return key[:period]
+    return key
+
+
+#-------------------------------------------------------------------
+# break_repeating_xor()
+#
+# Returns the (key, plaintext) tuple for a ciphertext encrypted
+# with repeating-key XOR. The num_keysizes keysizes with the
+# smallest normalized distance are tried, each column is solved as
+# single-character XOR, and the key giving the plaintext with the
+# best match for the language is selected. On equal match the
+# shortest key wins.
+#
+# The columns are not contiguous text, so their n-gram counts are
+# noise. They are solved with a model with only the letter
+# frequencies of the language, and the full language is used to
+# select the key. A language model folding the case keeps folding
+# it for the columns.
+#
+# The columns for all tried keysizes are solved together. If the
+# ciphertext is at least parallel_size bytes they are spread over
+# jobs worker processes so that the wall time is close to that of
+# solving a single keysize.
+#-------------------------------------------------------------------
+def break_repeating_xor(ciphertext, language, num_keysizes=3,
+                        min_keysize=2, max_keysize=40, jobs=None,
+                        parallel_size=65536):
+    ciphertext = CC_functions.as_bytes(ciphertext)
+    keysizes = [keysize for (distance, keysize) in
+                CC_hamming.keysize_distances(ciphertext, min_keysize,
+                                             max_keysize)[:num_keysizes]]
+    if not keysizes:
+        keysizes = [1]
+
+    columns = []
+    for keysize in keysizes:
+        columns.extend(transpose(ciphertext, keysize))
+
+    if len(ciphertext) < parallel_size:
+        jobs = 1
+    (alphabet, bigrams, trigrams) = language
+    letters = CC_language.LanguageModel(
+        alphabet, fold_case=getattr(language, 'fold_case', False))
+    xor_values = CC_batch.findxorvals(columns, letters, jobs)
+
+    best = None
+    for keysize in keysizes:
+        key = key_period("".join([chr(val) for val in xor_values[:keysize]]))
+        xor_values = xor_values[keysize:]
+        plaintext = CC_functions.xorstring(ciphertext, key)
+        match = CC_functions.match_string_language(plaintext, language)['match']
+        if best is None or (match, -len(key)) > (best[0], -len(best[1])):
+            best = (match, key, plaintext)
+
+    return best[1:]
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Run the functions to solve the problem with the given test case.
+#-------------------------------------------------------------------
+def main():
+    print "CC Problem 6_1."
+    print ""
+
+    eng_lang = CC_language.english()
+
+    string1 = "this is a test"
+    string2 = "wokka wokka!!!"
+    distance = CC_functions.hamming_distance(string1, string2)
+    print "Hamming distance between '%s' and '%s': %d" %\
+          (string1, string2, distance)
+    if distance != 37:
+        print "Error: Expected distance 37."
+    print ""
+
+    # Break a known key on our own problem description first.
+    with open("./Problems.txt", 'r') as f:
+        plaintext = f.read()
+    ciphertext = CC_functions.xorstring(plaintext, "Secworks")
+    (key, decoded) = break_repeating_xor(ciphertext, eng_lang)
+    print "Test with known key 'Secworks', found key: '%s'" % key
+    if decoded != plaintext:
+        print "Error: Decoded test string differ from the plaintext."
+    print ""
+
+    # Upper case text with a trained model folding the case.
+    statistics = CC_train.NgramStatistics(fold_case=True)
+    statistics.update(plaintext)
+    statistics.finish()
+    ciphertext = CC_functions.xorstring(plaintext.upper(), "SECRETKEYX")
+    (key, decoded) = break_repeating_xor(ciphertext, statistics.model())
+    print "Test of upper case text with key 'SECRETKEYX', found key: '%s'" % key
+    if key != "SECRETKEYX" or decoded != plaintext.upper():
+        print "Error: Wrong key for the upper case text."
+    print ""
+
+    filename = "./data/data_CC_6_1.txt"
+    if len(sys.argv) > 1:
+        filename = sys.argv[1]
+    if not os.path.exists(filename):
+        print "No data file %s found." % filename
+        return
+
+    with open(filename, 'r') as f:
+        ciphertext = "".join(f.read().split()).decode('base64')
+    (key, plaintext) = break_repeating_xor(ciphertext, eng_lang)
+    print "The key is: '%s'" % key
+    print "Decoded string:"
+    print plaintext
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_problem_6_1.py
+#=======================================================================
@@ -0,0 +1,94 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_problem_7_1.py
+# -----------------
+# Python solution to problem 7 in set 1 of the Matasano
+# Crypto Challenges.
+#
+#
+# Problem description:
+#
+# AES in ECB Mode
+#
+# The Base64-encoded content at the following location:
+#
+#     https://gist.github.com/3132853
+#
+# Has been encrypted via AES-128 in ECB mode under the key
+#
+#     "YELLOW SUBMARINE".
+#
+# (I like "YELLOW SUBMARINE" because it's exactly 16 bytes long).
+#
+# Decrypt it.
+#
+# Easiest way:
+#
+# Use OpenSSL::Cipher and give it AES-128-ECB as the cipher.
+#
+#
+# Notes: The data is expected in ./data/data_CC_7_1.txt. Another
+# file can be given on the command line. If the file is not found
+# the problem descriptions are encrypted and decrypted instead.
+# Large files can be decrypted in parallel with
+# CC_modes.decrypt_file().
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import os
+import sys
+
+import CC_aes
+import CC_modes
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Run the functions to solve the problem with the given test case.
+#-------------------------------------------------------------------
+def main():
+    print "CC Problem 7_1."
+    print ""
+
+    key = "YELLOW SUBMARINE"
+
+    filename = "./data/data_CC_7_1.txt"
+    if len(sys.argv) > 1:
+        filename = sys.argv[1]
+
+    if not os.path.exists(filename):
+        print "No data file %s found, testing with Problems.txt." % filename
+        with open("./Problems.txt", 'r') as f:
+            plaintext = f.read()
+        plaintext = plaintext[: len(plaintext) - len(plaintext) % 16]
+        ciphertext = CC_aes.encrypt_blocks(key, plaintext)
+        if CC_aes.decrypt_blocks(key, ciphertext) != plaintext:
+            print "Error: Decrypted text differ from the plaintext."
+        else:
+            print "Encrypted and decrypted %d bytes." % len(plaintext)
+        return
+
+    with open(filename, 'r') as f:
+        ciphertext = "".join(f.read().split()).decode('base64')
+    plaintext = CC_modes.ecb_decrypt(key, memoryview(ciphertext))
+    print "Decrypted text:"
+    print plaintext
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_problem_7_1.py
+#=======================================================================
@@ -0,0 +1,147 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_problem_8_1.py
+# -----------------
+# Python solution to problem 8 in set 1 of the Matasano
+# Crypto Challenges.
+#
+#
+# Problem description:
+#
+# Detecting ECB
+#
+# At the following URL are a bunch of hex-encoded ciphertexts:
+#
+#    https://gist.github.com/3132928
+#
+# One of them is ECB encrypted. Detect it.
+#
+# Remember that the problem with ECB is that it is stateless and
+# deterministic; the same 16 byte plaintext block will always produce
+# the same 16 byte ciphertext.
+#
+#
+# Notes: The data is expected in ./data/data_CC_8_1.txt. Another
+# file can be given on the command line. If the file is not found a
+# set of random lines with one ECB like line is used instead.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import os
+import random
+import sys
+
+import CC_ecb
+import CC_functions
+
+
+#-------------------------------------------------------------------
+# test_lines()
+#
+# Returns a list of random hex encoded lines where the line with
+# the given index has repeated blocks.
+#-------------------------------------------------------------------
+def test_lines(num_lines=200, ecb_index=132):
+    rng = random.Random(8)
+    lines = []
+    for i in range(num_lines):
+        blocks = ["".join([chr(rng.randrange(256)) for j in range(16)])
+                  for k in range(10)]
+        if i == ecb_index:
+            blocks[7] = blocks[2]
+            blocks[9] = blocks[2]
+        lines.append(CC_functions.hexencode("".join(blocks)))
+    return lines
+
+
+#-------------------------------------------------------------------
+# test_raw_lines()
+#
+# Returns a list of random raw lines ending in a newline, with no
+# other newline bytes. The line with index ecb_index has repeated
+# blocks and starts and ends with whitespace bytes, and the line
+# with index reuse_index starts with a whitespace byte and reuses
+# a block from the first line.
+#-------------------------------------------------------------------
+def test_raw_lines(num_lines=200, ecb_index=132, reuse_index=150):
+    rng = random.Random(8)
+    values = [val for val in range(256) if val != ord("\n")]
+    lines = []
+    for i in range(num_lines):
+        blocks = ["".join([chr(rng.choice(values)) for j in range(16)])
+                  for k in range(10)]
+        if i == ecb_index:
+            blocks[0] = " " + blocks[0][1:]
+            blocks[2] = blocks[2][:15] + "\t"
+            blocks[7] = blocks[2]
+            blocks[9] = blocks[2]
+        if i == reuse_index:
+            blocks[0] = "\r" + blocks[0][1:]
+            blocks[4] = lines[0][48:64]
+        lines.append("".join(blocks) + "\n")
+    return lines
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Run the functions to solve the problem with the given test case.
+#-------------------------------------------------------------------
+def main():
+    print "CC Problem 8_1."
+    print ""
+
+    filename = "./data/data_CC_8_1.txt"
+    if len(sys.argv) > 1:
+        filename = sys.argv[1]
+
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            results = CC_ecb.detect_ecb(f, top=3)
+        with open(filename, 'r') as f:
+            reused = list(CC_ecb.cross_line_reuse(f))
+    else:
+        print "No data file %s found, using test lines." % filename
+        lines = test_lines()
+        results = CC_ecb.detect_ecb(lines, top=3)
+        reused = list(CC_ecb.cross_line_reuse(lines))
+
+    if not results:
+        print "No line with repeated blocks found."
+    for (count, index) in results:
+        print "Line %d has %d repeated blocks, probably ECB encrypted." %\
+              (index, count)
+
+    print "Blocks reused across lines: %d" % len(reused)
+    for (index, offset, first) in reused[:10]:
+        print "Line %d offset %d repeats a block from line %d" %\
+              (index, offset, first)
+    print ""
+
+    # Raw lines must keep whitespace bytes at both ends.
+    lines = test_raw_lines()
+    results = CC_ecb.detect_ecb(lines, is_hex=False, jobs=1)
+    reused = list(CC_ecb.cross_line_reuse(lines, is_hex=False))
+    if results == [(2, 132)] and reused == [(150, 64, 0)]:
+        print "Raw lines with whitespace bytes scanned correctly."
+    else:
+        print "Error: Raw lines scanned wrong, got %r and %r." %\
+              (results, reused)
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_problem_8_1.py
+#=======================================================================
@@ -0,0 +1,221 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_sliding.py
+# -------------
+# Sliding window language scoring, used to find the part of a long
+# decrypted stream that looks like human text, for example where
+# only a part of the stream was decrypted with the right key.
+#
+# The score of every window is the match of match_string_language()
+# for the bytes in the window. It is kept up to date as the window
+# moves one byte at a time: the letter counts, the sums needed for
+# the distance and the n-gram counts are updated for the byte
+# leaving and the byte entering the window, so every step costs
+# the same regardless of the window size.
+#
+# The n-grams are counted at every position in the window, so a
+# self-overlapping n-gram such as 'll' is counted twice in 'lll'
+# where str.count() counts it once. Otherwise the scores are the
+# same as for match_string_language() up to rounding.
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import collections
+import itertools
+import os
+import random
+
+import CC_functions
+import CC_language
+
+
+#-------------------------------------------------------------------
+# as_model()
+#
+# Returns the language as a CC_language.LanguageModel.
+#-------------------------------------------------------------------
+def as_model(language):
+    if isinstance(language, CC_language.LanguageModel):
+        return language
+    return CC_language.LanguageModel(*language)
+
+
+#-------------------------------------------------------------------
+# ngram_weights()
+#
+# Returns a dictionary with the number of times every n-gram is
+# in the list.
+#-------------------------------------------------------------------
+def ngram_weights(ngrams):
+    weights = {}
+    for ngram in ngrams:
+        weights[ngram] = weights.get(ngram, 0) + 1
+    return weights
+
+
+#-------------------------------------------------------------------
+# events()
+#
+# Generates a (byte value, bigram weight, trigram weight) tuple for
+# every position in the data. The weights are the number of bigrams
+# and trigrams starting at the position. The data is processed in
+# pieces of piecesize bytes, so only one piece at a time is held
+# as lists.
+#-------------------------------------------------------------------
+def events(data, model, piecesize=65536):
+    bigrams = ngram_weights(model.bigrams)
+    trigrams = ngram_weights(model.trigrams)
+    for start in xrange(0, len(data), piecesize):
+        end = min(start + piecesize, len(data))
+        piece = CC_functions.as_bytes(data[start : end + 2])
+        if model.fold is not None:
+            piece = piece.translate(model.fold)
+        num = end - start
+        bigram_weights = map(bigrams.get,
+                             map(piece.__getslice__, xrange(num),
+                                 xrange(2, num + 2)),
+                             itertools.repeat(0, num))
+        trigram_weights = map(trigrams.get,
+                              map(piece.__getslice__, xrange(num),
+                                  xrange(3, num + 3)),
+                              itertools.repeat(0, num))
+        for event in itertools.izip(bytearray(piece[:num]), bigram_weights,
+                                    trigram_weights):
+            yield event
+
+
+#-------------------------------------------------------------------
+# window_scores()
+#
+# Generates the score of every window of window bytes in the data,
+# starting with the window at offset 0 and moving one byte at a
+# time. Data shorter than the window gives no scores.
+#
+# The sum of count * expected frequency is a float updated with
+# every step. To keep rounding errors from building up it is
+# recomputed from the counts once every window steps.
+#-------------------------------------------------------------------
+def window_scores(data, language, window=64):
+    if window < 3:
+        raise ValueError("Window must be at least 3 bytes, got %d." % window)
+    model = as_model(language)
+    freq = model.weights
+    in_alphabet = [0] * 256
+    for val in model.letters:
+        in_alphabet[val] = 1
+    expected_squares = sum([f * f for f in model.frequencies])
+    letters = list(model.letters)
+
+    counts = [0] * 256
+    num_alphabet = 0
+    weighted = 0.0
+    squares = 0
+    bigrams = 0
+    trigrams = 0
+    flength = float(window)
+    recent = collections.deque()
+    steps = 0
+
+    for event in events(data, model):
+        # Add the byte entering the window and the n-grams that
+        # now fit. A bigram starting at the second last position
+        # and a trigram starting at the third last position end
+        # at the entering byte.
+        recent.append(event)
+        val = event[0]
+        if in_alphabet[val]:
+            count = counts[val]
+            counts[val] = count + 1
+            squares += 2 * count + 1
+            weighted += freq[val]
+            num_alphabet += 1
+        if len(recent) >= 2:
+            bigrams += recent[-2][1]
+        if len(recent) >= 3:
+            trigrams += recent[-3][2]
+        if len(recent) < window:
+            continue
+
+        if len(recent) > window:
+            # Remove the byte leaving the window and the n-grams
+            # starting at it.
+            (val, bigram, trigram) = recent.popleft()
+            if in_alphabet[val]:
+                count = counts[val]
+                counts[val] = count - 1
+                squares -= 2 * count - 1
+                weighted -= freq[val]
+                num_alphabet -= 1
+            bigrams -= bigram
+            trigrams -= trigram
+
+        steps += 1
+        if steps == window:
+            steps = 0
+            weighted = sum([counts[val] * freq[val] for val in letters])
+
+        distance = (expected_squares - 2 * weighted / flength +
+                    squares / (flength * flength))
+        score = 10 * trigrams + 5 * bigrams + (1 - distance)
+        if (window - num_alphabet) / flength > 0.5:
+            score -= 100.0
+        yield score
+
+
+#-------------------------------------------------------------------
+# find_regions()
+#
+# Returns a list of (start, end) byte ranges of the data covered by
+# windows scoring at least threshold. Overlapping and adjacent
+# windows are merged into one region.
+#-------------------------------------------------------------------
+def find_regions(data, language, window=64, threshold=0.0):
+    regions = []
+    for (start, score) in enumerate(window_scores(data, language, window)):
+        if score < threshold:
+            continue
+        if regions and start <= regions[-1][1]:
+            regions[-1][1] = start + window
+        else:
+            regions.append([start, start + window])
+    return [tuple(region) for region in regions]
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Self test. Hides a part of the problem descriptions in random
+# data, as in a stream where only a part was decrypted with the
+# right key, and finds it again.
+#-------------------------------------------------------------------
+def main():
+    language = CC_language.english()
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "Problems.txt")) as f:
+        text = f.read()[:1000]
+    rng = random.Random(16)
+    noise = "".join([chr(rng.randrange(256)) for i in range(20000)])
+    data = noise[:12345] + text + noise[12345:]
+
+    print "Text hidden at bytes %d to %d." % (12345, 12345 + len(text))
+    for (start, end) in find_regions(data, language, window=64):
+        print "Found region from %d to %d:" % (start, end)
+        print repr(data[start : start + 60])
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_sliding.py
+#=======================================================================
@@ -0,0 +1,336 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+#=======================================================================
+#
+# CC_train.py
+# -----------
+# Trainer building a CC_language.LanguageModel from a text corpus,
+# so that other languages, or text with punctuation and spaces, can
+# be scored without typing in the tables by hand.
+#
+# The corpus files are read in chunks and the byte values, bigrams
+# and trigrams are counted. Only the trigrams are counted at every
+# position. The byte value and bigram counts are summed from the
+# trigrams found in each chunk into arrays of 256 and 65536
+# counters. The trigram table is kept below a given size by
+# dropping the least common trigrams, so memory use does not depend
+# on the corpus size. Large files can be split into byte ranges
+# counted by worker processes.
+#
+# The model gets every byte value at least min_frequency of the
+# corpus as its alphabet, and the most common bigrams and trigrams.
+# It is saved in the binary form read by CC_language.load().
+#
+# Usage:
+#   CC_train.py [--fold-case] [--jobs N] -o model.cclm corpus.txt ...
+#
+#
+# (c) 2012 Secworks Sweden AB
+# Joachim Strombergson
+#
+#=======================================================================
+
+import argparse
+import array
+import collections
+import heapq
+import multiprocessing
+import os
+import sys
+
+import CC_language
+
+
+#-------------------------------------------------------------------
+# NgramStatistics
+#
+# Byte value, bigram and trigram counts of one or more streams of
+# bytes. update() counts the next chunk of a stream and finish()
+# counts the end of it. The last two bytes of a chunk are kept
+# until the next chunk, since trigrams starting there end in it.
+#
+# Trigrams are dict keys. When there are more than max_trigrams
+# the least common half is dropped, which can make the counts of
+# rare trigrams too low but keeps the common ones.
+#-------------------------------------------------------------------
+class NgramStatistics(object):
+    def __init__(self, fold_case=False, max_trigrams=1 << 20):
+        self.fold_case = bool(fold_case)
+        self.max_trigrams = max_trigrams
+        self.unigrams = array.array('L', [0]) * 256
+        self.bigrams = array.array('L', [0]) * 65536
+        self.trigrams = {}
+        self.tail = ""
+        self.skipped = (0, 0)
+
+
+    #---------------------------------------------------------------
+    # update()
+    #
+    # Count the n-grams starting in the next chunk of the stream.
+    #---------------------------------------------------------------
+    def update(self, data):
+        if self.fold_case:
+            data = data.translate(CC_language.fold_table)
+        piece = self.tail + data
+        counts = collections.defaultdict(int)
+        for i in xrange(len(piece) - 2):
+            counts[piece[i : i + 3]] += 1
+        self.tail = piece[-2:]
+
+        unigrams = self.unigrams
+        bigrams = self.bigrams
+        trigrams = self.trigrams
+        for (trigram, count) in counts.iteritems():
+            unigrams[ord(trigram[0])] += count
+            bigrams[(ord(trigram[0]) << 8) | ord(trigram[1])] += count
+            trigrams[trigram] = trigrams.get(trigram, 0) + count
+        if len(trigrams) > self.max_trigrams:
+            self.prune()
+
+
+    #---------------------------------------------------------------
+    # finish()
+    #
+    # Count the n-grams starting in the last two bytes of the
+    # stream, where no trigram or only some trigrams start. If the
+    # stream is a byte range of a file, following is the bytes after
+    # it, which are only counted as the end of these n-grams. A new
+    # stream can then be counted.
+    #---------------------------------------------------------------
+    def finish(self, following=""):
+        if self.fold_case:
+            following = following.translate(CC_language.fold_table)
+        piece = self.tail + following
+        for i in range(len(self.tail)):
+            self.unigrams[ord(piece[i])] += 1
+            if i + 2 <= len(piece):
+                self.bigrams[(ord(piece[i]) << 8) | ord(piece[i + 1])] += 1
+            if i + 3 <= len(piece):
+                trigram = piece[i : i + 3]
+                self.trigrams[trigram] = self.trigrams.get(trigram, 0) + 1
+        self.tail = ""
+
+
+    #---------------------------------------------------------------
+    # merge()
+    #
+    # Add the counts of finished statistics from another stream or
+    # byte range.
+    #---------------------------------------------------------------
+    def merge(self, other):
+        for val in xrange(256):
+            self.unigrams[val] += other.unigrams[val]
+        for code in xrange(65536):
+            if other.bigrams[code]:
+                self.bigrams[code] += other.bigrams[code]
+        trigrams = self.trigrams
+        for (trigram, count) in other.trigrams.iteritems():
+            trigrams[trigram] = trigrams.get(trigram, 0) + count
+        if len(trigrams) > self.max_trigrams:
+            self.prune()
+
+
+    #---------------------------------------------------------------
+    # prune()
+    #
+    # Keep the most common half of max_trigrams trigrams.
+    #---------------------------------------------------------------
+    def prune(self):
+        keep = heapq.nlargest(self.max_trigrams // 2,
+                              self.trigrams.iteritems(),
+                              key=lambda item: item[1])
+        self.trigrams = dict(keep)
+
+
+    def total(self):
+        return sum(self.unigrams)
+
+
+    #---------------------------------------------------------------
+    # model()
+    #
+    # Returns the LanguageModel with the byte values at least
+    # min_frequency of all bytes as alphabet and the num_bigrams
+    # and num_trigrams most common n-grams. The model n-grams are
+    # lower case, so n-grams with upper case letters are skipped
+    # unless the case was folded when counting. The numbers of
+    # skipped bigrams and trigrams that were as common as the kept
+    # ones are left in skipped.
+    #---------------------------------------------------------------
+    def model(self, num_bigrams=30, num_trigrams=16, min_frequency=0.001):
+        total = self.total()
+        if not total:
+            raise ValueError("The corpus is empty.")
+
+        alphabet = {}
+        for val in range(256):
+            frequency = self.unigrams[val] / float(total)
+            if self.unigrams[val] and frequency >= min_frequency:
+                alphabet[chr(val)] = frequency
+
+        bigrams = ((count, chr(code >> 8) + chr(code & 0xff))
+                   for (code, count) in enumerate(self.bigrams) if count)
+        trigrams = ((count, trigram)
+                    for (trigram, count) in self.trigrams.iteritems())
+        (bigrams, skipped_bigrams) = most_common(bigrams, num_bigrams)
+        (trigrams, skipped_trigrams) = most_common(trigrams, num_trigrams)
+        self.skipped = (skipped_bigrams, skipped_trigrams)
+        return CC_language.LanguageModel(alphabet, bigrams, trigrams,
+                                         self.fold_case)
+
+
+#-------------------------------------------------------------------
+# most_common()
+#
+# Returns the num most common n-grams from (count, n-gram) pairs,
+# most common first, leaving out n-grams that are not lower case,
+# and the number of left out n-grams at least as common as the
+# least common one returned.
+#-------------------------------------------------------------------
+def most_common(counts, num):
+    lower = []
+    upper = []
+    for (count, ngram) in counts:
+        if ngram == ngram.lower():
+            lower.append((count, ngram))
+        else:
+            upper.append(count)
+    kept = heapq.nlargest(num, lower)
+    least = 0
+    if len(kept) == num and kept:
+        least = kept[-1][0]
+    skipped = len([count for count in upper if count >= least])
+    return ([ngram for (count, ngram) in kept], skipped)
+
+
+#-------------------------------------------------------------------
+# count_range()
+#
+# Returns the finished statistics for the n-grams starting in bytes
+# start to stop of the file. The two bytes after stop end the
+# n-grams starting just before it.
+#-------------------------------------------------------------------
+def count_range(task):
+    (filename, start, stop, fold_case, max_trigrams, chunksize) = task
+    statistics = NgramStatistics(fold_case, max_trigrams)
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            data = f.read(min(chunksize, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            statistics.update(data)
+        statistics.finish(f.read(2))
+    return statistics
+
+
+#-------------------------------------------------------------------
+# train()
+#
+# Returns the NgramStatistics of the files, with '-' for stdin. An
+# n-gram never spans two files. Files of at least parallel_size
+# bytes are split into byte ranges counted by jobs worker
+# processes (default one per CPU). With jobs set to 1 everything
+# is counted in the calling process. The ranges are merged in
+# order, so pruned trigram counts do not depend on which worker
+# finishes first.
+#-------------------------------------------------------------------
+def train(filenames, fold_case=False, jobs=None, chunksize=1 << 20,
+          max_trigrams=1 << 20, parallel_size=1 << 22):
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    statistics = NgramStatistics(fold_case, max_trigrams)
+
+    tasks = []
+    for filename in filenames:
+        if filename == '-':
+            for data in iter(lambda: sys.stdin.read(chunksize), ""):
+                statistics.update(data)
+            statistics.finish()
+            continue
+
+        size = os.path.getsize(filename)
+        num = 1
+        if jobs > 1 and size >= parallel_size:
+            num = 4 * jobs
+        for i in range(num):
+            (start, stop) = (size * i // num, size * (i + 1) // num)
+            if stop > start:
+                tasks.append((filename, start, stop, fold_case, max_trigrams,
+                              chunksize))
+
+    if jobs == 1 or len(tasks) < 2:
+        for task in tasks:
+            statistics.merge(count_range(task))
+        return statistics
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for result in pool.imap(count_range, tasks):
+            statistics.merge(result)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return statistics
+
+
+#-------------------------------------------------------------------
+# main()
+#
+# Train a model on the files given on the command line and save it.
+#-------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(
+        description="Train a language model on text files.")
+    parser.add_argument("files", nargs="+",
+                        help="Corpus files, - for stdin.")
+    parser.add_argument("-o", "--output", required=True,
+                        help="Model file to write.")
+    parser.add_argument("--fold-case", action="store_true",
+                        help="Count upper and lower case letters as one.")
+    parser.add_argument("--bigrams", type=int, default=30,
+                        help="Number of bigrams in the model, default 30.")
+    parser.add_argument("--trigrams", type=int, default=16,
+                        help="Number of trigrams in the model, default 16.")
+    parser.add_argument("--min-frequency", type=float, default=0.001,
+                        help="Least frequency of a byte value in the "
+                        "alphabet, default 0.001.")
+    parser.add_argument("--max-trigrams", type=int, default=1 << 20,
+                        help="Most trigrams kept while counting.")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Number of worker processes, default one per CPU.")
+    args = parser.parse_args()
+
+    statistics = train(args.files, args.fold_case, args.jobs,
+                       max_trigrams=args.max_trigrams)
+    try:
+        model = statistics.model(args.bigrams, args.trigrams,
+                                 args.min_frequency)
+    except ValueError as e:
+        sys.stderr.write("%s: error: %s\n" % (parser.prog, e))
+        sys.exit(1)
+    model.save(args.output)
+    print "Counted %d bytes." % statistics.total()
+    print "Alphabet: %r" % "".join(sorted(model.alphabet))
+    print "Bigrams: %s" % " ".join([repr(ngram) for ngram in model.bigrams])
+    print "Trigrams: %s" % " ".join([repr(ngram) for ngram in model.trigrams])
+    if any(statistics.skipped):
+        print "Skipped %d bigrams and %d trigrams with upper case letters," %\
+              statistics.skipped
+        print "use --fold-case to count them as lower case."
+
+
+#-------------------------------------------------------------------
+# __name__
+# Python thingy to run as a stand alone if called.
+#-------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
+
+#=======================================================================
+# EOF CC_train.py
+#=======================================================================